@@ -56,8 +56,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',  # só atua com REQUEST_METRICS_ENABLED=True
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware', 
+    'core.middleware.StaticFilesMiddleware',  # WhiteNoise compatível com ASGI
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,6 +72,7 @@ ROOT_URLCONF = 'angowork.urls'
 
 TEMPLATES = [
     {
+        # Com REQUEST_METRICS_ENABLED passa a TimedDjangoTemplates (ver abaixo)
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
@@ -91,13 +93,84 @@ WSGI_APPLICATION = 'angowork.wsgi.application'
 # ======================================================================
 # DATABASE (SQLITE LOCAL / POSTGRES EM PRODUÇÃO)
 # ======================================================================
+# Modo do servidor (ver gunicorn.conf.py). Em ASGI cada pedido usa a base
+# numa thread própria, por isso ligações persistentes não são reaproveitadas
+# e ficariam abertas até expirar: aí fecham-se no fim de cada pedido.
+SERVER_MODE = config('SERVER_MODE', default='wsgi').lower()
+
 DATABASES = {
     'default': dj_database_url.config(
         default=config('DATABASE_URL', default=f'sqlite:///{BASE_DIR}/db.sqlite3'),
-        conn_max_age=600
+        conn_max_age=0 if SERVER_MODE == 'asgi' else 600
     )
 }
 
+# Só para `manage.py test` (que liga SQLITE_FILE_TESTS): a base de testes em
+# memória partilhada não espera por locks, e os testes com threads de
+# core/tests.py precisam de um ficheiro e de escritas que aguardam a vez.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3' and config('SQLITE_FILE_TESTS', default=False, cast=bool):
+    DATABASES['default'].setdefault('OPTIONS', {}).update(transaction_mode='IMMEDIATE', timeout=20)
+    DATABASES['default']['TEST'] = {'NAME': str(BASE_DIR / 'test_db.sqlite3')}
+
+# ======================================================================
+# CACHE
+# ======================================================================
+# Por omissão usa memória local; em produção basta apontar CACHE_BACKEND e
+# CACHE_LOCATION para um backend partilhado (ex.: FileBasedCache ou Redis).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='angowork'),
+    }
+}
+
+# Sessões: 'django.contrib.sessions.backends.cached_db' (cache + base) ou
+# '...signed_cookies' (sem tabela) evitam o SELECT da sessão em cada pedido.
+# cached_db e USER_CACHE_ENABLED pedem uma cache partilhada (não LocMem).
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.db')
+
+# Utilizador autenticado em cache, com versão por utilizador (ver core/user_cache.py)
+USER_CACHE_ENABLED = config('USER_CACHE_ENABLED', default=False, cast=bool)
+USER_CACHE_TIMEOUT = config('USER_CACHE_TIMEOUT', default=300, cast=int)
+USER_CACHE_VERSION_TIMEOUT = config('USER_CACHE_VERSION_TIMEOUT', default=60 * 60 * 24 * 7, cast=int)
+USER_CACHE_ALIAS = config('USER_CACHE_ALIAS', default='default')
+
+# Configurações da plataforma (ver core/config_cache.py). A camada partilhada
+# só deve apontar para uma cache comum a todos os workers (Redis, Memcached...)
+CONFIG_CACHE_ALIAS = config('CONFIG_CACHE_ALIAS', default='') or None
+CONFIG_CACHE_LOCAL_TTL = config('CONFIG_CACHE_LOCAL_TTL', default=30, cast=int)
+CONFIG_CACHE_SHARED_TTL = config('CONFIG_CACHE_SHARED_TTL', default=3600, cast=int)
+
+# ======================================================================
+# MÉTRICAS POR PEDIDO (ver core/middleware.py)
+# ======================================================================
+REQUEST_METRICS_ENABLED = config('REQUEST_METRICS_ENABLED', default=False, cast=bool)
+REQUEST_METRICS_DUPLICATE_THRESHOLD = config('REQUEST_METRICS_DUPLICATE_THRESHOLD', default=3, cast=int)
+REQUEST_METRICS_WINDOW = config('REQUEST_METRICS_WINDOW', default=1000, cast=int)
+if REQUEST_METRICS_ENABLED:
+    # Mede o tempo de cada render; sem métricas fica o backend padrão, sem custo extra
+    TEMPLATES[0]['BACKEND'] = 'core.template_backend.TimedDjangoTemplates'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.metrics': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# ======================================================================
+# COMISSÕES DA REDE (ver core/commissions.py)
+# ======================================================================
+# Taxa por nível da rede: 1º convidante, 2º, 3º...
+COMMISSION_RATES = {
+    'task': ('0.20', '0.03', '0.02'),
+    'level_purchase': ('0.15', '0.03', '0.01'),
+}
+
 # ======================================================================
 # INTERNACIONALIZAÇÃO
 # ======================================================================
@@ -131,6 +204,10 @@ if not DEBUG:
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Com um proxy à frente: 'nginx' (X-Accel-Redirect) ou 'sendfile' (X-Sendfile)
+MEDIA_ACCEL = config('MEDIA_ACCEL', default='')
+MEDIA_ACCEL_PREFIX = config('MEDIA_ACCEL_PREFIX', default='/protected-media/')
+MEDIA_CACHE_MAX_AGE = config('MEDIA_CACHE_MAX_AGE', default=60 * 60 * 24 * 365, cast=int)
 
 # ======================================================================
 # SEGURANÇA EXTRA (ATIVADA APENAS EM PRODUÇÃO)
@@ -145,4 +222,14 @@ if not DEBUG:
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.CustomUser'
+
+# O ModelBackend fica em segundo para as sessões abertas antes do
+# CachedModelBackend (a sessão guarda o caminho do backend usado no login)
+AUTHENTICATION_BACKENDS = [
+    'core.auth_backends.CachedModelBackend',
+    # As sessões guardam o caminho do backend: as abertas antes do
+    # CachedModelBackend só voltam a carregar com o ModelBackend na lista
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 LOGIN_URL = 'login'
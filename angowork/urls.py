@@ -1,9 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
-from django.views.static import serve
 from django.conf.urls.static import static
 
+from core.media import serve
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('i18n/', include('django.conf.urls.i18n')),  # Rota necessária para a troca de idioma
@@ -11,9 +12,10 @@ urlpatterns = [
 ]
 
 # Esta configuração permite que o Render sirva os comprovativos
-# mesmo com DEBUG=False
+# mesmo com DEBUG=False (com cache, 304 e Range; ver core/media.py).
+# Sem document_root: serve() lê settings.MEDIA_ROOT em cada pedido.
 urlpatterns += [
-    re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
+    re_path(r'^media/(?P<path>.*)$', serve),
 ]
 
 # Mantém a compatibilidade com arquivos estáticos em desenvolvimento
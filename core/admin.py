@@ -1,14 +1,32 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.utils import timezone
 from django.utils.safestring import mark_safe 
+from . import exports, ledger
+from .deposits import ConcurrentApprovalError, approve_deposits
+from .pagination import EstimatedCountPaginator
 from .models import (
     CustomUser, PlatformSettings, Level, BankDetails, Deposit, 
-    Withdrawal, Task, Roulette, RouletteSettings, UserLevel, PlatformBankDetails
+    Withdrawal, Task, Roulette, RouletteSettings, UserLevel, PlatformBankDetails, Job
 )
 
+# --- LISTAGENS GRANDES ---
+# Tabelas que crescem todos os dias: relações carregadas no mesmo SELECT da
+# página, contagem estimada sem filtros e sem o segundo COUNT(*) do total.
+# raw_id_fields evita um <select> com todos os utilizadores no formulário.
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 100
+    raw_id_fields = ('user',)
+
 # --- CONFIGURAÇÕES DO USUÁRIO ---
 
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ('invited_by',)
     list_display = ('phone_number', 'available_balance', 'free_days_count', 'is_staff', 'is_active', 'date_joined')
     search_fields = ('phone_number', 'invite_code')
     list_filter = ('is_staff', 'is_active', 'level_active')
@@ -18,10 +36,12 @@ class CustomUserAdmin(admin.ModelAdmin):
 # --- CONFIGURAÇÕES DE DEPÓSITO ---
 
 @admin.register(Deposit)
-class DepositAdmin(admin.ModelAdmin):
+class DepositAdmin(LargeTableAdmin):
+    list_select_related = ('user',)
     list_display = ('user', 'amount', 'payment_method', 'payer_name', 'is_approved', 'created_at', 'proof_link') 
     search_fields = ('user__phone_number', 'payer_name')
     list_filter = ('is_approved', 'payment_method', 'created_at')
+    actions = ['approve_selected', 'export_csv']
     
     readonly_fields = ('current_proof_display', 'created_at')
     fieldsets = (
@@ -37,11 +57,35 @@ class DepositAdmin(admin.ModelAdmin):
     )
 
     def proof_link(self, obj):
+        if obj.proof_thumbnail:
+            # Miniatura gerada pelo worker: a lista não descarrega as fotos originais
+            return mark_safe(f'<a href="{obj.proof_of_payment.url}" target="_blank"><img src="{obj.proof_thumbnail.url}" loading="lazy" style="max-height: 60px; border-radius: 4px;" /></a>')
         if obj.proof_of_payment:
             return mark_safe(f'<a href="{obj.proof_of_payment.url}" target="_blank" style="color: #2e7d32; font-weight: bold;">Ver Imagem</a>')
         return "Nenhum"
     proof_link.short_description = 'Comprovativo'
 
+    @admin.action(description='Aprovar depósitos selecionados e creditar saldo')
+    def approve_selected(self, request, queryset):
+        try:
+            approved, total = approve_deposits(queryset.values_list('pk', flat=True))
+        except ConcurrentApprovalError as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return
+        skipped = queryset.count() - approved
+        self.message_user(request, f'{approved} depósitos aprovados ({total} KZ); {skipped} já estavam aprovados.')
+
+    @admin.action(description='Exportar selecionados (CSV)')
+    def export_csv(self, request, queryset):
+        return exports.csv_response('depositos.csv', exports.deposit_rows(queryset))
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Mantém o contador de depósitos aprovados alinhado com a aprovação manual
+        if change and 'is_approved' in form.changed_data:
+            delta = obj.amount if obj.is_approved else -obj.amount
+            ledger.adjust_summary(obj.user_id, deposits_total=delta)
+
     def current_proof_display(self, obj):
         if obj.proof_of_payment:
             return mark_safe(f'''
@@ -56,12 +100,14 @@ class DepositAdmin(admin.ModelAdmin):
 # --- CONFIGURAÇÕES DE SAQUE (AQUI ESTÁ A MUDANÇA!) ---
 
 @admin.register(Withdrawal)
-class WithdrawalAdmin(admin.ModelAdmin):
+class WithdrawalAdmin(LargeTableAdmin):
+    list_select_related = ('user', 'user__bank_details')
     # ADICIONADO: 'dados_bancarios_cliente' para aparecer na lista principal
     list_display = ('user', 'amount', 'status', 'dados_bancarios_cliente', 'created_at')
     search_fields = ('user__phone_number', 'withdrawal_details')
     list_filter = ('status', 'method', 'created_at')
     list_editable = ('status',)
+    actions = ['export_csv']
     
     fieldsets = (
         ('Informações de Solicitação', {
@@ -85,6 +131,20 @@ class WithdrawalAdmin(admin.ModelAdmin):
             return mark_safe('<span style="color: red;">Não cadastrado</span>')
     dados_bancarios_cliente.short_description = 'IBAN (Perfil)'
 
+    @admin.action(description='Exportar selecionados para pagamento (CSV)')
+    def export_csv(self, request, queryset):
+        return exports.csv_response('saques.csv', exports.withdrawal_rows(queryset))
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Mantém o contador de saques aprovados alinhado com a mudança de estado
+        if change and 'status' in form.changed_data:
+            was_approved = form.initial.get('status') == 'Aprovado'
+            is_approved = obj.status == 'Aprovado'
+            if was_approved != is_approved:
+                delta = obj.amount if is_approved else -obj.amount
+                ledger.adjust_summary(obj.user_id, withdrawals_total=delta)
+
     def dados_completos_perfil(self, obj):
         # Mostra todos os dados do banco dentro do formulário de edição
         try:
@@ -119,13 +179,15 @@ class PlatformBankDetailsAdmin(admin.ModelAdmin):
 # --- TAREFAS E HISTÓRICO ---
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(LargeTableAdmin):
+    list_select_related = ('user',)
     list_display = ('user', 'earnings', 'task_day', 'completed_at')
     search_fields = ('user__phone_number',)
     list_filter = ('task_day', 'completed_at')
 
 @admin.register(UserLevel)
-class UserLevelAdmin(admin.ModelAdmin):
+class UserLevelAdmin(LargeTableAdmin):
+    list_select_related = ('user', 'level')
     list_display = ('user', 'level', 'purchase_date', 'is_active')
     search_fields = ('user__phone_number', 'level__name')
     list_filter = ('is_active', 'level')
@@ -133,16 +195,34 @@ class UserLevelAdmin(admin.ModelAdmin):
 # --- ROLETA ---
 
 @admin.register(Roulette)
-class RouletteAdmin(admin.ModelAdmin):
+class RouletteAdmin(LargeTableAdmin):
+    list_select_related = ('user',)
     list_display = ('user', 'prize', 'is_approved', 'spin_date')
     list_filter = ('is_approved',)
 
 @admin.register(RouletteSettings)
 class RouletteSettingsAdmin(admin.ModelAdmin):
-    list_display = ('id', 'prizes')
+    list_display = ('id', 'prizes', 'weights')
 
 @admin.register(BankDetails)
-class BankDetailsAdmin(admin.ModelAdmin):
+class BankDetailsAdmin(LargeTableAdmin):
+    list_select_related = ('user',)
     list_display = ('user', 'bank_name', 'account_holder_name', 'IBAN')
     search_fields = ('user__phone_number', 'bank_name', 'IBAN')
-    
\ No newline at end of file
+
+
+# --- FILA DE TAREFAS ---
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'run_after', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('kind', 'payload', 'attempts', 'locked_at', 'last_error', 'created_at', 'finished_at')
+    actions = ['retry_jobs']
+
+    @admin.action(description='Repetir jobs selecionados')
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status=Job.EM_CURSO).update(
+            status=Job.PENDENTE, attempts=0, run_after=timezone.now(), locked_at=None,
+        )
+        self.message_user(request, f'{updated} jobs voltaram à fila.')
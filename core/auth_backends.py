@@ -0,0 +1,10 @@
+from django.contrib.auth.backends import ModelBackend
+
+from . import user_cache
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend que carrega o utilizador da sessão através de user_cache."""
+
+    def get_user(self, user_id):
+        return user_cache.get_user(user_id, lambda: super(CachedModelBackend, self).get_user(user_id))
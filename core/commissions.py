@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+
+from . import ledger
+from .models import LedgerEntry, ReferralPath, UserLevel
+
+# --- MOTOR DE COMISSÕES DA REDE ---
+# As taxas por nível da rede vêm de settings.COMMISSION_RATES (ou dos valores
+# padrão abaixo). Os convidantes elegíveis saem numa só consulta à tabela de
+# fecho e todos os créditos seguem num único lançamento do ledger.
+
+TASK = 'task'
+LEVEL_PURCHASE = 'level_purchase'
+
+DEFAULT_COMMISSION_RATES = {
+    TASK: ('0.20', '0.03', '0.02'),
+    LEVEL_PURCHASE: ('0.15', '0.03', '0.01'),
+}
+
+# Na compra de nível só recebe quem tem plano ativo, e a cadeia pára no
+# primeiro convidante que não tenha.
+REQUIRES_ACTIVE_CHAIN = {LEVEL_PURCHASE}
+
+
+def get_rates(kind):
+    rates = getattr(settings, 'COMMISSION_RATES', {}).get(kind, DEFAULT_COMMISSION_RATES[kind])
+    return [Decimal(str(rate)) for rate in rates]
+
+
+def commission_entries(user_id, kind, base_amount):
+    """Lançamentos de comissão para os convidantes acima de `user_id`."""
+    rates = get_rates(kind)
+    if not rates:
+        return []
+
+    uplines = ReferralPath.objects.filter(descendant_id=user_id, depth__lte=len(rates)).order_by('depth')
+    if kind not in REQUIRES_ACTIVE_CHAIN:
+        # Sem a subconsulta Exists(): nas tarefas todos os convidantes recebem
+        return [
+            (ancestor_id, LedgerEntry.SUBSIDIO, base_amount * rates[depth - 1])
+            for ancestor_id, depth in uplines.values_list('ancestor_id', 'depth')
+        ]
+
+    uplines = uplines.annotate(
+        has_active_level=Exists(UserLevel.objects.filter(user=OuterRef('ancestor_id'), is_active=True))
+    ).values_list('ancestor_id', 'depth', 'has_active_level')
+
+    entries = []
+    for ancestor_id, depth, has_active_level in uplines:
+        if not has_active_level:
+            break
+        entries.append((ancestor_id, LedgerEntry.SUBSIDIO, base_amount * rates[depth - 1]))
+    return entries
+
+
+def pay_commissions(user_id, kind, base_amount):
+    ledger.post(commission_entries(user_id, kind, base_amount))
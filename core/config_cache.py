@@ -0,0 +1,81 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import Level, PlatformBankDetails, PlatformSettings, RouletteSettings
+
+# --- CACHE DAS CONFIGURAÇÕES DA PLATAFORMA ---
+# Duas camadas: um dicionário local ao processo com TTL curto e, opcionalmente,
+# a cache partilhada do Django (CONFIG_CACHE_ALIAS; ignorada se for LocMem).
+# Os sinais em signals.py apagam as entradas sempre que o admin grava ou remove
+# uma configuração; noutros processos a camada local expira sozinha ao fim de
+# CONFIG_CACHE_LOCAL_TTL. Valores que movem dinheiro (ex.: o preço de um nível
+# no momento da compra) são sempre lidos da base.
+
+LOCAL_TTL = getattr(settings, 'CONFIG_CACHE_LOCAL_TTL', 30)
+SHARED_TTL = getattr(settings, 'CONFIG_CACHE_SHARED_TTL', 3600)
+CACHE_ALIAS = getattr(settings, 'CONFIG_CACHE_ALIAS', None)
+KEY_PREFIX = 'config:'
+
+PLATFORM_SETTINGS = 'platform_settings'
+PLATFORM_BANK_DETAILS = 'platform_bank_details'
+ROULETTE_SETTINGS = 'roulette_settings'
+LEVELS = 'levels'
+
+_local = {}
+_MISSING = object()
+
+
+def _shared_cache():
+    if not CACHE_ALIAS:
+        return None
+    cache = caches[CACHE_ALIAS]
+    # LocMemCache é por processo: como "partilhada" só serviria valores
+    # antigos aos outros workers, que a invalidação não alcança
+    return None if isinstance(cache, LocMemCache) else cache
+
+
+def _load(key, loader):
+    now = time.monotonic()
+    entry = _local.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    shared = _shared_cache()
+    value = shared.get(KEY_PREFIX + key, _MISSING) if shared else _MISSING
+    if value is _MISSING:
+        value = loader()
+        if shared:
+            shared.set(KEY_PREFIX + key, value, SHARED_TTL)
+
+    _local[key] = (now + LOCAL_TTL, value)
+    return value
+
+
+def invalidate(*keys):
+    """Apaga as chaves indicadas (ou todas) das duas camadas."""
+    keys = keys or (PLATFORM_SETTINGS, PLATFORM_BANK_DETAILS, ROULETTE_SETTINGS, LEVELS)
+    for key in keys:
+        _local.pop(key, None)
+    shared = _shared_cache()
+    if shared:
+        shared.delete_many([KEY_PREFIX + key for key in keys])
+
+
+def get_platform_settings():
+    return _load(PLATFORM_SETTINGS, lambda: PlatformSettings.objects.first())
+
+
+def get_platform_bank_details():
+    return _load(PLATFORM_BANK_DETAILS, lambda: list(PlatformBankDetails.objects.all()))
+
+
+def get_roulette_settings():
+    return _load(ROULETTE_SETTINGS, lambda: RouletteSettings.objects.first())
+
+
+def get_levels():
+    """Todos os níveis, ordenados pelo valor de depósito."""
+    return _load(LEVELS, lambda: list(Level.objects.order_by('deposit_value')))
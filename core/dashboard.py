@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import CustomUser, Task, UserLevel
+
+# --- RESUMO DO PAINEL (MENU E RENDA) ---
+# Todos os totais do utilizador saem numa única consulta: os acumulados vêm
+# dos contadores de BalanceSummary (ver ledger.py) e o rendimento de hoje é
+# uma subconsulta correlacionada sobre as tarefas do próprio utilizador.
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+ZERO = Value(Decimal('0.00'), output_field=MONEY)
+
+
+def _user_sum(queryset, field):
+    total = (
+        queryset.filter(user=OuterRef('pk'))
+        .order_by()
+        .values('user')
+        .annotate(total=Sum(field))
+        .values('total')[:1]
+    )
+    return Coalesce(Subquery(total, output_field=MONEY), ZERO)
+
+
+def get_dashboard_summary(user):
+    """Devolve os totais usados por `menu` e `renda` numa só ida à base de dados."""
+    today = timezone.localdate()
+    active_level_name = (
+        UserLevel.objects.filter(user=OuterRef('pk'), is_active=True)
+        .order_by('pk')
+        .values('level__name')[:1]
+    )
+
+    summary = (
+        CustomUser.objects.filter(pk=user.pk)
+        .annotate(
+            approved_deposit_total=Coalesce(F('balance_summary__deposits_total'), ZERO),
+            daily_income=_user_sum(Task.objects.filter(task_day=today), 'earnings'),
+            total_withdrawals=Coalesce(F('balance_summary__withdrawals_total'), ZERO),
+            total_task_earnings=Coalesce(F('balance_summary__task_income_total'), ZERO),
+            active_level_name=Subquery(active_level_name),
+        )
+        .values(
+            'approved_deposit_total',
+            'daily_income',
+            'total_withdrawals',
+            'total_task_earnings',
+            'active_level_name',
+        )
+        .first()
+    )
+    return summary or {
+        'approved_deposit_total': 0,
+        'daily_income': 0,
+        'total_withdrawals': 0,
+        'total_task_earnings': 0,
+        'active_level_name': None,
+    }
@@ -0,0 +1,48 @@
+from decimal import Decimal
+
+from django.db import transaction
+
+from . import ledger
+from .models import Deposit, LedgerEntry
+
+# --- APROVAÇÃO DE DEPÓSITOS EM LOTE ---
+# Uma só transação para o lote inteiro. Por bloco: uma consulta para ler os
+# pendentes, um UPDATE para os marcar como aprovados e um ledger.post, que
+# agrupa os créditos por utilizador num UPDATE ... CASE com F().
+# Depósitos já aprovados são ignorados, por isso repetir a operação é seguro.
+
+APPROVAL_CHUNK_SIZE = 500
+
+
+class ConcurrentApprovalError(Exception):
+    """Outro processo aprovou parte do lote ao mesmo tempo; nada foi gravado."""
+
+
+def approve_deposits(deposit_ids, chunk_size=APPROVAL_CHUNK_SIZE):
+    """Aprova e credita os depósitos pendentes entre `deposit_ids`. Devolve (aprovados, valor total)."""
+    ids = sorted(set(deposit_ids))
+    approved, total = 0, Decimal('0')
+
+    with transaction.atomic():
+        for start in range(0, len(ids), chunk_size):
+            pending = list(
+                Deposit.objects.select_for_update()
+                .filter(pk__in=ids[start:start + chunk_size], is_approved=False)
+                .values_list('pk', 'user_id', 'amount')
+            )
+            if not pending:
+                continue
+
+            updated = Deposit.objects.filter(pk__in=[pk for pk, _, _ in pending], is_approved=False).update(is_approved=True)
+            if updated != len(pending):
+                # Só acontece sem SELECT ... FOR UPDATE (SQLite); o rollback evita créditos a dobrar
+                raise ConcurrentApprovalError('Depósitos aprovados em simultâneo por outro processo; repita a operação.')
+
+            ledger.post([
+                (user_id, LedgerEntry.DEPOSITO, amount, f'Depósito #{pk}')
+                for pk, user_id, amount in pending
+            ])
+            approved += len(pending)
+            total += sum(amount for _, _, amount in pending)
+
+    return approved, total
@@ -0,0 +1,84 @@
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+# --- CÓDIGOS DE CONVITE ---
+# Cada código vem de uma sequência na base de dados, reservada em blocos por
+# processo: não há consulta "já existe?" antes de gravar e é possível gerar
+# milhares de códigos para um bulk_create de uma só vez.
+#
+# O número da sequência passa por uma permutação (multiplicação por uma
+# constante ímpar módulo 2^39), por isso os códigos não são previsíveis à
+# vista, mas continuam únicos. O primeiro carácter é sempre uma letra fora
+# de 0-9A-F, o que separa os novos códigos dos antigos (hexadecimais).
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'  # base32 de Crockford
+PREFIXES = 'GHJKMNPQRSTVWXYZ'  # 16 letras que nunca aparecem num código hexadecimal
+BODY_LENGTH = 7
+SPACE_BITS = 4 + 5 * BODY_LENGTH  # 39 bits
+SPACE = 1 << SPACE_BITS
+MULTIPLIER = 0x2F4A7C159B  # ímpar, logo invertível módulo 2^39
+OFFSET = 0x1B3D5F7A9
+
+BLOCK_SIZE = getattr(settings, 'INVITE_CODE_BLOCK_SIZE', 50)
+
+_lock = threading.Lock()
+_block = iter(())
+
+
+def encode(value):
+    """Converte um número da sequência no código de convite correspondente."""
+    scrambled = (value * MULTIPLIER + OFFSET) % SPACE
+    body = []
+    for _ in range(BODY_LENGTH):
+        scrambled, digit = divmod(scrambled, 32)
+        body.append(ALPHABET[digit])
+    return PREFIXES[scrambled] + ''.join(reversed(body))
+
+
+def reserve(count):
+    """Reserva `count` números consecutivos da sequência e devolve o intervalo."""
+    from .models import InviteCodeSequence
+
+    with transaction.atomic():
+        sequence = InviteCodeSequence.objects.filter(pk=InviteCodeSequence.SINGLETON_ID)
+        if not sequence.update(next_value=F('next_value') + count):
+            InviteCodeSequence.objects.get_or_create(pk=InviteCodeSequence.SINGLETON_ID)
+            sequence.update(next_value=F('next_value') + count)
+        end = sequence.values_list('next_value', flat=True).get()
+    if end > SPACE:
+        raise RuntimeError('Espaço de códigos de convite esgotado.')
+    return range(end - count, end)
+
+
+def _adopt(block):
+    global _block
+    with _lock:
+        _block = block
+
+
+def next_code():
+    """Próximo código do bloco deste processo, reservando outro quando acaba."""
+    with _lock:
+        value = next(_block, None)
+    if value is None:
+        block = iter(reserve(BLOCK_SIZE))
+        value = next(block)
+        if connection.in_atomic_block:
+            # Dentro de uma transação a reserva só vale se ela for confirmada;
+            # um rollback devolveria o intervalo à sequência e repetiria códigos.
+            transaction.on_commit(lambda: _adopt(block))
+        else:
+            _adopt(block)
+    return encode(value)
+
+
+def assign_codes(users):
+    """Preenche invite_code dos utilizadores que ainda não têm, com uma só reserva."""
+    pending = [user for user in users if not user.invite_code]
+    if pending:
+        for user, value in zip(pending, reserve(len(pending))):
+            user.invite_code = encode(value)
+    return users
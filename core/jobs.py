@@ -0,0 +1,87 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# --- FILA DE TAREFAS NA BASE DE DADOS ---
+# O pedido HTTP só grava uma linha em Job, na mesma transação que os dados a
+# que ela se refere; o comando run_jobs executa-as fora do ciclo do pedido.
+# Cada tipo de job aponta para uma função que recebe o payload como kwargs.
+
+PROCESS_DEPOSIT_PROOF = 'process_deposit_proof'
+
+HANDLERS = {
+    PROCESS_DEPOSIT_PROOF: 'core.proofs.process_deposit_proof',
+}
+
+# Um job "em curso" há mais do que isto pertence a um worker que morreu
+STALE_AFTER = timedelta(seconds=getattr(settings, 'JOB_STALE_AFTER', 600))
+RETRY_BASE_DELAY = 30
+
+
+class PermanentJobError(Exception):
+    """Erro que não se resolve a repetir (ex.: ficheiro inválido): o job falha logo."""
+
+
+def enqueue(kind, **payload):
+    if kind not in HANDLERS:
+        raise ValueError(f'Tipo de job desconhecido: {kind}')
+    return Job.objects.create(kind=kind, payload=payload)
+
+
+def claim(batch_size):
+    """Marca até `batch_size` jobs prontos como em curso e devolve-os."""
+    now = timezone.now()
+    ready = Job.objects.filter(status=Job.PENDENTE, run_after__lte=now)
+    stale = Job.objects.filter(status=Job.EM_CURSO, locked_at__lt=now - STALE_AFTER)
+
+    with transaction.atomic():
+        candidates = (ready | stale).order_by('run_after', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            # Vários workers em Postgres não disputam as mesmas linhas
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('pk', flat=True)[:batch_size])
+        Job.objects.filter(pk__in=ids).update(status=Job.EM_CURSO, locked_at=now)
+    return list(Job.objects.filter(pk__in=ids).order_by('run_after', 'pk'))
+
+
+def run(job):
+    """Executa um job já reclamado. Devolve True se terminou com sucesso."""
+    job.attempts += 1
+    try:
+        import_string(HANDLERS[job.kind])(**job.payload)
+    except Exception as exc:
+        job.last_error = ''.join(traceback.format_exception(exc))[-4000:]
+        if job.attempts >= job.max_attempts or isinstance(exc, PermanentJobError):
+            job.status = Job.FALHOU
+            job.finished_at = timezone.now()
+            logger.error('Job %s falhou definitivamente: %s', job, exc)
+        else:
+            # Espera exponencial: 30s, 60s, 120s, ...
+            job.status = Job.PENDENTE
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (job.attempts - 1))
+            logger.warning('Job %s falhou (tentativa %d): %s', job, job.attempts, exc)
+        ok = False
+    else:
+        job.status = Job.CONCLUIDO
+        job.finished_at = timezone.now()
+        job.last_error = ''
+        ok = True
+    job.locked_at = None
+    job.save(update_fields=['attempts', 'status', 'run_after', 'locked_at', 'last_error', 'finished_at'])
+    return ok
+
+
+def run_pending(batch_size=20):
+    """Processa um lote. Devolve (executados, falhados)."""
+    jobs = claim(batch_size)
+    failed = sum(not run(job) for job in jobs)
+    return len(jobs), failed
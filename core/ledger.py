@@ -0,0 +1,131 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+
+from . import user_cache
+from .models import BalanceSummary, CustomUser, Deposit, LedgerEntry, Task, Withdrawal
+
+# --- EXTRATO (LEDGER) E CONTADORES POR UTILIZADOR ---
+# Todo movimento de saldo passa por aqui: grava-se uma linha no extrato e
+# atualizam-se só as colunas afetadas com expressões F(), na mesma transação.
+# Vários utilizadores num só lançamento (ex.: comissões da rede) resultam num
+# único UPDATE ... CASE por tabela.
+
+# Contador do resumo incrementado por cada tipo de movimento
+SUMMARY_FIELD = {
+    LedgerEntry.DEPOSITO: 'deposits_total',
+    LedgerEntry.TAREFA: 'task_income_total',
+    LedgerEntry.SUBSIDIO: 'subsidy_total',
+    LedgerEntry.ROLETA: 'subsidy_total',
+}
+
+# Movimentos que também entram no saldo de subsídios
+SUBSIDY_KINDS = {LedgerEntry.SUBSIDIO, LedgerEntry.ROLETA}
+
+
+def _bulk_increment(model, deltas_by_pk):
+    """Aplica {pk: {campo: delta}} num único UPDATE com CASE por campo. Devolve as linhas alteradas."""
+    fields = {field for deltas in deltas_by_pk.values() for field in deltas}
+    values = {}
+    for field in fields:
+        # Um WHEN por valor distinto (pk IN ...), não por utilizador: depósitos
+        # e comissões repetem poucos valores e o CASE fica pequeno
+        pks_by_delta = defaultdict(list)
+        for pk, deltas in deltas_by_pk.items():
+            if deltas.get(field):
+                pks_by_delta[deltas[field]].append(pk)
+        whens = [When(pk__in=pks, then=Value(delta)) for delta, pks in pks_by_delta.items()]
+        output = model._meta.get_field(field)
+        values[field] = F(field) + Case(
+            *whens,
+            default=Value(Decimal('0')),
+            output_field=DecimalField(max_digits=output.max_digits, decimal_places=output.decimal_places),
+        )
+    if not values:
+        return 0
+    return model.objects.filter(pk__in=list(deltas_by_pk)).update(**values)
+
+
+def adjust_summary(user_id, **deltas):
+    """Soma `deltas` aos contadores do resumo, criando a linha se ainda não existir."""
+    values = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not values:
+        return
+    if not BalanceSummary.objects.filter(pk=user_id).update(**values):
+        BalanceSummary.objects.bulk_create([BalanceSummary(user_id=user_id)], ignore_conflicts=True)
+        BalanceSummary.objects.filter(pk=user_id).update(**values)
+
+
+def post(entries):
+    """Regista movimentos `(user_id, kind, amount[, note])` e aplica-os aos saldos."""
+    rows = []
+    balances = defaultdict(lambda: defaultdict(Decimal))
+    summaries = defaultdict(lambda: defaultdict(Decimal))
+
+    for user_id, kind, amount, *note in entries:
+        amount = Decimal(amount)
+        rows.append(LedgerEntry(user_id=user_id, kind=kind, amount=amount, note=note[0] if note else ''))
+        balances[user_id]['available_balance'] += amount
+        if kind in SUBSIDY_KINDS:
+            balances[user_id]['subsidy_balance'] += amount
+        if kind in SUMMARY_FIELD:
+            summaries[user_id][SUMMARY_FIELD[kind]] += amount
+
+    if not rows:
+        return
+
+    with transaction.atomic():
+        LedgerEntry.objects.bulk_create(rows)
+        _bulk_increment(CustomUser, balances)
+        user_cache.invalidate(*balances)
+        if summaries:
+            # Garante a linha de resumo de cada utilizador antes do incremento
+            BalanceSummary.objects.bulk_create([BalanceSummary(user_id=pk) for pk in summaries], ignore_conflicts=True)
+            _bulk_increment(BalanceSummary, summaries)
+
+
+def debit(user_id, kind, amount, note=''):
+    """Debita `amount` apenas se houver saldo suficiente. Devolve False caso contrário."""
+    amount = Decimal(amount)
+    with transaction.atomic():
+        updated = CustomUser.objects.filter(pk=user_id, available_balance__gte=amount).update(
+            available_balance=F('available_balance') - amount
+        )
+        if not updated:
+            return False
+        LedgerEntry.objects.create(user_id=user_id, kind=kind, amount=-amount, note=note)
+        user_cache.invalidate(user_id)
+    return True
+
+
+def rebuild_summaries(chunk_size=2000):
+    """Recalcula todos os contadores a partir do histórico. Devolve o nº de utilizadores."""
+    def totals(queryset, field):
+        return dict(queryset.order_by().values('user').annotate(total=Sum(field)).values_list('user', 'total'))
+
+    deposits = totals(Deposit.objects.filter(is_approved=True), 'amount')
+    withdrawals = totals(Withdrawal.objects.filter(status='Aprovado'), 'amount')
+    tasks = totals(Task.objects.all(), 'earnings')
+
+    count = 0
+    with transaction.atomic():
+        BalanceSummary.objects.all().delete()
+        batch = []
+        users = CustomUser.objects.values_list('pk', 'subsidy_balance').order_by()
+        for user_id, subsidy in users.iterator(chunk_size=chunk_size):
+            batch.append(BalanceSummary(
+                user_id=user_id,
+                deposits_total=deposits.get(user_id) or 0,
+                withdrawals_total=withdrawals.get(user_id) or 0,
+                task_income_total=tasks.get(user_id) or 0,
+                subsidy_total=subsidy or 0,
+            ))
+            if len(batch) >= chunk_size:
+                BalanceSummary.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        BalanceSummary.objects.bulk_create(batch)
+        count += len(batch)
+    return count
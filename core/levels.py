@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import user_cache
+from .models import CustomUser, UserLevel
+
+# --- EXPIRAÇÃO DOS CICLOS DE INVESTIMENTO ---
+# Cada UserLevel guarda `expires_at` (compra + Level.cycle_days). O índice
+# parcial userlevel_active_expiry_idx só contém as linhas ativas, por isso
+# encontrar as vencidas é uma leitura curta do início do índice.
+# Por bloco: uma consulta lê (id, user_id) dos vencidos, um UPDATE desativa-os
+# e outro UPDATE desliga `level_active` a quem ficou sem nenhum plano ativo.
+# Nenhuma linha é carregada como objeto, e cada bloco é a sua transação.
+
+EXPIRY_CHUNK_SIZE = 5000
+
+
+def expire_chunk(now, chunk_size=EXPIRY_CHUNK_SIZE):
+    """Desativa até `chunk_size` planos vencidos em `now`. Devolve (planos, utilizadores desativados)."""
+    with transaction.atomic():
+        rows = list(
+            UserLevel.objects.filter(is_active=True, expires_at__lte=now)
+            .order_by('expires_at', 'pk')
+            .values_list('pk', 'user_id')[:chunk_size]
+        )
+        if not rows:
+            return 0, 0
+        level_ids = [pk for pk, _ in rows]
+        user_ids = sorted({user_id for _, user_id in rows})
+
+        # Repetir o filtro protege contra outro processo que já os tenha desativado
+        expired = UserLevel.objects.filter(pk__in=level_ids, is_active=True).update(is_active=False)
+
+        # Quem comprou outro plano entretanto continua ativo
+        still_active = UserLevel.objects.filter(user=OuterRef('pk'), is_active=True)
+        deactivated = (
+            CustomUser.objects.filter(pk__in=user_ids, level_active=True)
+            .exclude(Exists(still_active))
+            .update(level_active=False)
+        )
+        user_cache.invalidate(*user_ids)
+    return expired, deactivated
+
+
+def expire_levels(now=None, chunk_size=EXPIRY_CHUNK_SIZE):
+    """Desativa todos os planos vencidos, bloco a bloco. Devolve (planos, utilizadores desativados)."""
+    now = now or timezone.now()
+    expired = deactivated = 0
+    while True:
+        chunk_expired, chunk_deactivated = expire_chunk(now, chunk_size)
+        if not chunk_expired:
+            return expired, deactivated
+        expired += chunk_expired
+        deactivated += chunk_deactivated
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.deposits import APPROVAL_CHUNK_SIZE, approve_deposits
+from core.models import Deposit
+
+
+class Command(BaseCommand):
+    help = (
+        'Aprova depósitos pendentes e credita o saldo dos utilizadores numa só transação. '
+        'Depósitos já aprovados são ignorados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='IDs dos depósitos a aprovar.')
+        parser.add_argument('--all-pending', action='store_true', help='Aprova todos os depósitos pendentes.')
+        parser.add_argument('--chunk-size', type=int, default=APPROVAL_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['all_pending']:
+            ids = list(Deposit.objects.filter(is_approved=False).values_list('pk', flat=True))
+        elif options['ids']:
+            ids = options['ids']
+        else:
+            raise CommandError('Indique IDs de depósitos ou use --all-pending.')
+
+        started = time.perf_counter()
+        approved, total = approve_deposits(ids, chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{approved} de {len(ids)} depósitos aprovados ({total} KZ) em {elapsed:.2f}s.'
+        ))
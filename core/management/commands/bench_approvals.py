@@ -0,0 +1,88 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core import ledger
+from core.deposits import APPROVAL_CHUNK_SIZE, approve_deposits
+from core.models import CustomUser, Deposit, LedgerEntry
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    """execute_wrapper que só conta (CaptureQueriesContext guarda no máximo 9000 consultas)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def approve_one_by_one(deposit_ids):
+    """Caminho antigo (views.approve_deposit): um save e um ledger.post por depósito."""
+    for deposit in Deposit.objects.filter(pk__in=deposit_ids).order_by('pk'):
+        if not deposit.is_approved:
+            deposit.is_approved = True
+            deposit.save(update_fields=['is_approved'])
+            ledger.post([(deposit.user_id, LedgerEntry.DEPOSITO, deposit.amount, f'Depósito #{deposit.pk}')])
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a aprovação de depósitos um a um (caminho antigo) com approve_deposits em lote, '
+        'sobre depósitos pendentes sintéticos. Tudo é desfeito no fim (rollback).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--deposits', type=int, default=10000, help='Depósitos pendentes por corrida.')
+        parser.add_argument('--users', type=int, default=1000, help='Utilizadores por onde os depósitos se repartem.')
+        parser.add_argument('--chunk-size', type=int, default=APPROVAL_CHUNK_SIZE)
+        parser.add_argument('--skip-old', action='store_true', help='Mede só approve_deposits.')
+
+    def handle(self, *args, **options):
+        user_ids = list(CustomUser.objects.order_by('id').values_list('pk', flat=True)[:options['users']])
+        if not user_ids:
+            raise CommandError('A base de dados não tem utilizadores; execute seed_load_data primeiro.')
+
+        runs = [('lote (approve_deposits)', lambda ids: approve_deposits(ids, chunk_size=options['chunk_size']))]
+        if not options['skip_old']:
+            runs.insert(0, ('um a um (antigo)', approve_one_by_one))
+
+        self.stdout.write(f'{options["deposits"]} depósitos pendentes de {len(user_ids)} utilizadores')
+        for label, approve in runs:
+            try:
+                with transaction.atomic():
+                    ids = self._pending(user_ids, options['deposits'])
+                    credits_before = LedgerEntry.objects.filter(kind=LedgerEntry.DEPOSITO).count()
+                    queries = QueryCounter()
+                    with connection.execute_wrapper(queries):
+                        started = time.perf_counter()
+                        approve(ids)
+                        elapsed = time.perf_counter() - started
+                    approved = Deposit.objects.filter(pk__gte=min(ids), is_approved=True).count()
+                    credited = LedgerEntry.objects.filter(kind=LedgerEntry.DEPOSITO).count() - credits_before
+                    raise Rollback
+            except Rollback:
+                pass
+            self.stdout.write(
+                f'  {label:24} {elapsed:8.2f}s {len(ids) / elapsed:10.1f} depósitos/s '
+                f'consultas={queries.count:6} aprovados={approved} créditos={credited}'
+            )
+
+    def _pending(self, user_ids, count):
+        deposits = Deposit.objects.bulk_create(
+            Deposit(
+                user_id=user_ids[index % len(user_ids)], amount=Decimal('5000'), payment_method='bank',
+                proof_of_payment='deposit_proofs/bench.jpg',
+            )
+            for index in range(count)
+        )
+        if deposits and deposits[0].pk is None:
+            return list(Deposit.objects.filter(is_approved=False).order_by('-pk').values_list('pk', flat=True)[:count])
+        return [deposit.pk for deposit in deposits]
@@ -0,0 +1,99 @@
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+
+from core import commissions, ledger
+from core.management.commands.bench_approvals import QueryCounter, Rollback
+from core.management.commands.bench_routes import percentile
+from core.models import CustomUser, LedgerEntry, ReferralPath, UserLevel
+from core.referrals import upline_ids
+
+
+def old_commission_entries(user_id, kind, base_amount):
+    """Caminho antigo: a lista de convidantes e, na compra de nível, uma consulta por convidante."""
+    entries = []
+    for upline_id, rate in zip(upline_ids(user_id), commissions.get_rates(kind)):
+        if kind in commissions.REQUIRES_ACTIVE_CHAIN and not UserLevel.objects.filter(user_id=upline_id, is_active=True).exists():
+            break
+        entries.append((upline_id, LedgerEntry.SUBSIDIO, base_amount * rate))
+    return entries
+
+
+def old_post(entries):
+    """ledger.post antigo: um UPDATE de saldo e um de resumo por utilizador."""
+    rows = []
+    balances = defaultdict(lambda: defaultdict(Decimal))
+    summaries = defaultdict(lambda: defaultdict(Decimal))
+    for user_id, kind, amount in entries:
+        rows.append(LedgerEntry(user_id=user_id, kind=kind, amount=amount))
+        balances[user_id]['available_balance'] += amount
+        if kind in ledger.SUBSIDY_KINDS:
+            balances[user_id]['subsidy_balance'] += amount
+        if kind in ledger.SUMMARY_FIELD:
+            summaries[user_id][ledger.SUMMARY_FIELD[kind]] += amount
+    if not rows:
+        return
+    with transaction.atomic():
+        LedgerEntry.objects.bulk_create(rows)
+        for user_id, deltas in balances.items():
+            CustomUser.objects.filter(pk=user_id).update(**{field: F(field) + delta for field, delta in deltas.items()})
+        for user_id, deltas in summaries.items():
+            ledger.adjust_summary(user_id, **deltas)
+
+
+PATHS = [
+    ('por convidante (antigo)', old_commission_entries, old_post),
+    ('lote (commission_entries)', commissions.commission_entries, ledger.post),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara o cálculo e lançamento de comissões por convidante (caminho antigo) com '
+        'commission_entries + ledger.post, para utilizadores com três níveis de convidantes. '
+        'Tudo é desfeito no fim (rollback).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500, help='Utilizadores (com 3 convidantes acima) medidos.')
+        parser.add_argument('--base', default='5000', help='Valor sobre o qual incide a comissão.')
+
+    def handle(self, *args, **options):
+        user_ids = list(
+            ReferralPath.objects.filter(depth=3).order_by('descendant_id')
+            .values_list('descendant_id', flat=True)[:options['users']]
+        )
+        if not user_ids:
+            raise CommandError('Nenhum utilizador com três níveis de convidantes; execute seed_load_data primeiro.')
+        base = Decimal(options['base'])
+
+        self.stdout.write(f'{len(user_ids)} utilizadores com cadeia de 3 convidantes')
+        for kind in (commissions.TASK, commissions.LEVEL_PURCHASE):
+            totals = {}
+            for label, entries_for, post in PATHS:
+                timings, queries = [], QueryCounter()
+                credited = Decimal('0')
+                try:
+                    with transaction.atomic():
+                        with connection.execute_wrapper(queries):
+                            for user_id in user_ids:
+                                started = time.perf_counter()
+                                entries = entries_for(user_id, kind, base)
+                                post(entries)
+                                timings.append((time.perf_counter() - started) * 1000)
+                                credited += sum(amount for _, _, amount in entries)
+                        raise Rollback
+                except Rollback:
+                    pass
+                totals[label] = credited
+                self.stdout.write(
+                    f'  {kind:15} {label:26} p50={percentile(timings, 50):7.3f}ms p95={percentile(timings, 95):7.3f}ms '
+                    f'{len(timings) / (sum(timings) / 1000):9.1f} op/s consultas/op={queries.count / len(timings):5.2f} '
+                    f'creditado={credited}'
+                )
+            if len(set(totals.values())) != 1:
+                self.stdout.write(self.style.ERROR(f'  {kind}: os dois caminhos creditam valores diferentes: {totals}'))
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.views.static import serve as static_serve
+
+from core.media import serve as media_serve
+from core.management.commands.bench_routes import percentile
+
+VIEWS = [
+    ('django.views.static.serve', static_serve),
+    ('core.media.serve', media_serve),
+]
+
+
+def consume(response):
+    size = 0
+    for chunk in response:
+        size += len(chunk)
+    response.close()
+    return size
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara o débito de django.views.static.serve com core.media.serve: pedidos completos, '
+        'pedidos condicionais (If-None-Match) e pedidos Range, sobre ficheiros sintéticos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=300, help='Pedidos medidos por cenário.')
+        parser.add_argument('--size-kb', type=int, action='append', default=[], help='Tamanho dos ficheiros (repetível).')
+
+    def handle(self, *args, **options):
+        sizes = options['size_kb'] or [50, 2000]
+        root = tempfile.mkdtemp(prefix='bench_media_')
+        factory = RequestFactory()
+        try:
+            for size_kb in sizes:
+                name = f'deposit_proofs/bench_{size_kb}.jpg'
+                os.makedirs(os.path.join(root, 'deposit_proofs'), exist_ok=True)
+                with open(os.path.join(root, name), 'wb') as fh:
+                    fh.write(os.urandom(size_kb * 1024))
+
+                self.stdout.write(f'\nFicheiro de {size_kb} KB')
+                for label, view in VIEWS:
+                    etag = view(factory.get('/'), name, document_root=root).get('ETag')
+                    scenarios = [
+                        ('completo', {}),
+                        ('condicional', {'HTTP_IF_NONE_MATCH': etag} if etag else {}),
+                        ('range 64KB', {'HTTP_RANGE': 'bytes=0-65535'}),
+                    ]
+                    for scenario, headers in scenarios:
+                        self._measure(factory, view, label, scenario, name, root, headers, options['iterations'])
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    def _measure(self, factory, view, label, scenario, name, root, headers, iterations):
+        timings, transferred, statuses = [], 0, set()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            response = view(factory.get('/', **headers), name, document_root=root)
+            transferred += consume(response)
+            timings.append((time.perf_counter() - t0) * 1000)
+            statuses.add(response.status_code)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'  {label:27} {scenario:12} estado={",".join(map(str, sorted(statuses))):7} '
+            f'p50={percentile(timings, 50):7.3f}ms p95={percentile(timings, 95):7.3f}ms '
+            f'{iterations / elapsed:8.1f} req/s {transferred / elapsed / 1024 / 1024:8.1f} MB/s'
+        )
@@ -0,0 +1,80 @@
+import random
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import roulette
+from core.management.commands.bench_approvals import Rollback
+from core.models import CustomUser
+
+
+def old_spin(prizes_raw, rng):
+    """Caminho antigo (views.spin_roulette): reconstrói a lista ponderada a cada giro."""
+    prizes = [p.strip() for p in prizes_raw.split(',')]
+    weighted_pool = []
+    for p in prizes:
+        val = Decimal(p)
+        if val == 0:
+            weighted_pool.extend([p] * 10)
+        elif val <= 500:
+            weighted_pool.extend([p] * 5)
+        else:
+            weighted_pool.append(p)
+    winning_prize_str = rng.choice(weighted_pool)
+    return winning_prize_str, Decimal(winning_prize_str)
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede giros por segundo do sorteio da roleta: lista ponderada reconstruída a cada giro '
+        '(caminho antigo) contra o PrizeSampler compilado, e opcionalmente o giro completo com a base.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spins', type=int, default=200000, help='Giros medidos por caminho (só sorteio).')
+        parser.add_argument('--prizes', default=roulette.DEFAULT_PRIZES, help='Prémios separados por vírgula.')
+        parser.add_argument('--db-spins', type=int, default=0, help='Giros completos (spin_for) numa transação desfeita no fim.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        prizes_raw = options['prizes']
+        prizes = roulette.parse_prizes(prizes_raw)
+        sampler = roulette.PrizeSampler(prizes, roulette.parse_weights('', prizes))
+        paths = [
+            ('lista ponderada (antigo)', lambda rng: old_spin(prizes_raw, rng)),
+            ('PrizeSampler', sampler.spin),
+        ]
+
+        self.stdout.write(f'{len(prizes)} prémios, {options["spins"]} giros por caminho')
+        for label, spin in paths:
+            rng = random.Random(options['seed'])
+            counts = Counter()
+            started = time.perf_counter()
+            for _ in range(options['spins']):
+                counts[spin(rng)[0]] += 1
+            elapsed = time.perf_counter() - started
+            shares = ' '.join(f'{prize}={counts[prize] / options["spins"]:.3f}' for prize in dict.fromkeys(prizes))
+            self.stdout.write(f'  {label:26} {options["spins"] / elapsed:12.0f} giros/s  {shares}')
+
+        if options['db_spins']:
+            self._measure_db(options['db_spins'])
+
+    def _measure_db(self, spins):
+        user = CustomUser.objects.order_by('id').first()
+        if user is None:
+            self.stdout.write(self.style.WARNING('Sem utilizadores: execute seed_load_data para medir o giro completo.'))
+            return
+        try:
+            with transaction.atomic():
+                CustomUser.objects.filter(pk=user.pk).update(roulette_spins=spins)
+                started = time.perf_counter()
+                for _ in range(spins):
+                    roulette.spin_for(user)
+                elapsed = time.perf_counter() - started
+                raise Rollback
+        except Rollback:
+            pass
+        self.stdout.write(f'  {"spin_for (com a base)":26} {spins / elapsed:12.0f} giros/s')
@@ -0,0 +1,187 @@
+import json
+import math
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import CustomUser, Withdrawal
+from core.pagination import encode_cursor
+
+# Rotas de core/urls.py medidas por omissão: (nome, método HTTP)
+ROUTES = [
+    ('menu', 'get'),
+    ('tarefa', 'get'),
+    ('process_task', 'post'),
+    ('equipa', 'get'),
+    ('roleta', 'get'),
+    ('spin_roulette', 'post'),
+    ('saque', 'get'),
+    ('perfil', 'get'),
+    ('renda', 'get'),
+    ('nivel', 'get'),
+    ('deposito', 'get'),
+]
+
+# Cenários de dados pesados (ver seed_load_data --heavy-users): os utilizadores
+# com mais linhas da tabela indicada e as rotas que as leem
+SCENARIOS = {
+    'saque': ('withdrawal', [('saque', 'get'), ('withdrawal_history', 'get')]),
+    # Maiores redes (caminhos da tabela de fecho abaixo do utilizador)
+    'equipa': ('downline_paths', [('equipa', 'get')]),
+    'menu': ('task', [('menu', 'get'), ('renda', 'get')]),
+}
+
+
+def percentile(values, pct):
+    """Percentil pelo método do posto mais próximo."""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede cada rota de core/urls.py com o cliente de testes do Django: nº de consultas, '
+        'latência p50/p95/p99 e pedidos por segundo. Grava o resultado em JSON para comparar commits. '
+        'Atenção: process_task e spin-roulette alteram dados; use uma base gerada com seed_load_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Utilizadores (os de maior equipa) usados em rotação.')
+        parser.add_argument('--phone', action='append', default=[], help='Usa estes utilizadores em vez da amostra.')
+        parser.add_argument('--iterations', type=int, default=200, help='Pedidos medidos por rota.')
+        parser.add_argument('--warmup', type=int, default=10, help='Pedidos de aquecimento por rota (não medidos).')
+        parser.add_argument('--route', action='append', default=[], help='Mede só as rotas indicadas (nome da URL).')
+        parser.add_argument('--scenario', choices=list(SCENARIOS), help='Utilizadores e rotas de um cenário de dados pesados.')
+        parser.add_argument('--output', help='Ficheiro JSON onde gravar os resultados.')
+        parser.add_argument('--compare', help='JSON de uma execução anterior, para mostrar as diferenças.')
+
+    def handle(self, *args, **options):
+        users = self._users(options)
+        routes = SCENARIOS[options['scenario']][1] if options['scenario'] else ROUTES
+        routes = [(name, method) for name, method in routes if not options['route'] or name in options['route']]
+        if not routes:
+            raise CommandError('Nenhuma rota corresponde a --route.')
+        targets = [(name, reverse(name), method) for name, method in routes]
+        cursor = self._middle_cursor(users) if options['scenario'] == 'saque' else None
+        if cursor and any(name == 'withdrawal_history' for name, _ in routes):
+            targets.append(('withdrawal_history (meio)', f'{reverse("withdrawal_history")}?cursor={cursor}', 'get'))
+
+        host = next((h.strip() for h in settings.ALLOWED_HOSTS if h.strip() and h.strip() != '*'), 'localhost')
+        clients = []
+        for user in users:
+            client = Client(HTTP_HOST=host)
+            client.force_login(user)
+            clients.append(client)
+
+        results = {}
+        for name, url, method in targets:
+            results[name] = self._measure(clients, url, method, options)
+            row = results[name]
+            self.stdout.write(
+                f'{name:26} p50={row["p50_ms"]:8.2f}ms p95={row["p95_ms"]:8.2f}ms p99={row["p99_ms"]:8.2f}ms '
+                f'rps={row["rps"]:8.1f} consultas={row["queries_max"]}'
+            )
+
+        report = {
+            'meta': {
+                'timestamp': datetime.now(dt_timezone.utc).isoformat(),
+                'revision': git_revision(),
+                'database': connection.vendor,
+                'users': [user.phone_number for user in users],
+                'iterations': options['iterations'],
+                'scenario': options['scenario'],
+            },
+            'routes': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Resultados gravados em {options["output"]}'))
+        if options['compare']:
+            self._compare(options['compare'], results)
+
+    def _users(self, options):
+        if options['phone']:
+            users = list(CustomUser.objects.filter(phone_number__in=options['phone']))
+        elif options['scenario']:
+            related = SCENARIOS[options['scenario']][0]
+            users = list(
+                CustomUser.objects.annotate(rows=Count(related)).filter(rows__gt=0)
+                .order_by('-rows', 'id')[:options['users']]
+            )
+        else:
+            # Os utilizadores com mais convidados diretos são os casos mais pesados
+            users = list(
+                CustomUser.objects.annotate(invited=Count('customuser')).filter(invited__gt=0)
+                .order_by('-invited', 'id')[:options['users']]
+            ) or list(CustomUser.objects.order_by('id')[:options['users']])
+        if not users:
+            raise CommandError('A base de dados não tem utilizadores; execute seed_load_data primeiro.')
+        return users
+
+    def _middle_cursor(self, users):
+        """Cursor a meio do histórico do primeiro utilizador: o custo tem de ser o da 1.ª página."""
+        history = Withdrawal.objects.filter(user=users[0]).order_by('-created_at', '-id')
+        middle = history.values_list('created_at', 'id')[history.count() // 2:][:1]
+        return encode_cursor(*middle[0]) if middle else None
+
+    def _measure(self, clients, url, method, options):
+        for i in range(options['warmup']):
+            getattr(clients[i % len(clients)], method)(url, secure=True)
+
+        timings, queries, statuses = [], [], Counter()
+        started = time.perf_counter()
+        for i in range(options['iterations']):
+            client = clients[i % len(clients)]
+            with CaptureQueriesContext(connection) as captured:
+                t0 = time.perf_counter()
+                response = getattr(client, method)(url, secure=True)
+                timings.append((time.perf_counter() - t0) * 1000)
+            queries.append(len(captured.captured_queries))
+            statuses[response.status_code] += 1
+        elapsed = time.perf_counter() - started
+
+        return {
+            'url': url,
+            'method': method.upper(),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'rps': round(len(timings) / elapsed, 1),
+            'queries_max': max(queries),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'status_codes': {str(code): count for code, count in statuses.items()},
+        }
+
+    def _compare(self, path, results):
+        with open(path) as fh:
+            previous = json.load(fh)['routes']
+        self.stdout.write('\nComparação com ' + path)
+        for name, row in results.items():
+            old = previous.get(name)
+            if not old:
+                continue
+            delta_p95 = row['p95_ms'] - old['p95_ms']
+            delta_queries = row['queries_max'] - old['queries_max']
+            line = f'{name:26} p95 {delta_p95:+8.2f}ms  consultas {delta_queries:+d}'
+            self.stdout.write(self.style.ERROR(line) if delta_queries > 0 else line)
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.levels import EXPIRY_CHUNK_SIZE, expire_levels
+
+
+class Command(BaseCommand):
+    help = (
+        'Desativa os planos cujo ciclo (Level.cycle_days) terminou e atualiza level_active '
+        'dos utilizadores que ficaram sem plano. Pode correr no cron ou, com --loop, como processo próprio.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Não termina; repete a verificação a cada --interval segundos.')
+        parser.add_argument('--interval', type=float, default=60.0, help='Pausa entre verificações com --loop.')
+        parser.add_argument('--chunk-size', type=int, default=EXPIRY_CHUNK_SIZE, help='Planos desativados por transação.')
+
+    def handle(self, *args, **options):
+        expired_total = deactivated_total = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                expired, deactivated = expire_levels(chunk_size=options['chunk_size'])
+                expired_total += expired
+                deactivated_total += deactivated
+                if expired:
+                    self.stdout.write(
+                        f'{expired} planos expirados, {deactivated} utilizadores sem plano '
+                        f'({time.perf_counter() - started:.2f}s).'
+                    )
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f'{expired_total} planos expirados, {deactivated_total} utilizadores sem plano ativo.'
+        ))
@@ -0,0 +1,43 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from core import exports
+from core.models import Deposit, Withdrawal
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta para CSV os saques (ou depósitos) com os dados bancários dos clientes, '
+        'em streaming. Por omissão só os pendentes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['saques', 'depositos'])
+        parser.add_argument('--all', action='store_true', help='Inclui também aprovados e recusados.')
+        parser.add_argument('--output', help='Ficheiro de destino (por omissão, a saída padrão).')
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['kind'] == 'saques':
+            queryset = Withdrawal.objects.all() if options['all'] else Withdrawal.objects.filter(status='Pendente')
+            rows = exports.withdrawal_rows(queryset, options['chunk_size'])
+        else:
+            queryset = Deposit.objects.all() if options['all'] else Deposit.objects.filter(is_approved=False)
+            rows = exports.deposit_rows(queryset, options['chunk_size'])
+
+        if not options['output']:
+            self._write(self.stdout, rows)
+            return
+        with open(options['output'], 'w', encoding='utf-8-sig', newline='') as out:
+            count = self._write(out, rows)
+        self.stdout.write(self.style.SUCCESS(f'{count} linhas exportadas para {options["output"]}.'))
+
+    def _write(self, out, rows):
+        writer = csv.writer(out)
+        writer.writerow(next(rows))
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
@@ -0,0 +1,210 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Count
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from core import user_cache
+from core.management.commands.bench_routes import git_revision, percentile
+from core.models import CustomUser, LedgerEntry, Task
+
+# Rotas disponíveis: nome da URL -> método HTTP
+ROUTES = {
+    'process_task': 'POST',
+    'spin_roulette': 'POST',
+    'menu': 'GET',
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga do gunicorn em modo WSGI e ASGI (SERVER_MODE, ver gunicorn.conf.py) na mesma máquina: '
+        'pedidos concorrentes a process_task/spin_roulette, com débito e latência p50/p95/p99 por modo. '
+        'Altera dados (giros, tarefas); use uma base gerada com seed_load_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', choices=['wsgi', 'asgi'], default=[], help='Modos a testar (omissão: ambos).')
+        parser.add_argument('--route', action='append', choices=list(ROUTES), default=[], help='Rotas a testar (omissão: process_task e spin_roulette).')
+        parser.add_argument('--requests', type=int, default=2000, help='Pedidos por rota e modo.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Pedidos em simultâneo.')
+        parser.add_argument('--workers', type=int, default=2, help='Workers do gunicorn (WEB_CONCURRENCY).')
+        parser.add_argument('--users', type=int, default=50, help='Utilizadores usados em rotação (1 = todos os pedidos no mesmo utilizador).')
+        parser.add_argument('--refill-spins', type=int, default=0, help='Repõe N giros a cada utilizador antes de cada corrida.')
+        parser.add_argument('--output', help='Ficheiro JSON onde gravar os resultados.')
+
+    def handle(self, *args, **options):
+        modes = options['mode'] or ['wsgi', 'asgi']
+        routes = options['route'] or ['process_task', 'spin_roulette']
+        users = list(CustomUser.objects.filter(is_active=True).order_by('id')[:options['users']])
+        if not users:
+            raise CommandError('A base de dados não tem utilizadores; execute seed_load_data primeiro.')
+
+        self.host = next((h.strip() for h in settings.ALLOWED_HOSTS if h.strip() and h.strip() != '*'), 'localhost')
+        self.scheme = 'https' if settings.SECURE_PROXY_SSL_HEADER else 'http'
+        sessions = self._sessions(users)
+
+        results = {}
+        for mode in modes:
+            port = free_port()
+            server = self._start(mode, port, options['workers'])
+            try:
+                for route in routes:
+                    if options['refill_spins']:
+                        CustomUser.objects.filter(pk__in=[u.pk for u in users]).update(roulette_spins=options['refill_spins'])
+                        user_cache.invalidate(*[u.pk for u in users])
+                    started_at = datetime.now(dt_timezone.utc)
+                    row = self._run(port, route, sessions, options)
+                    if route == 'process_task':
+                        row.update(self._verify_tasks(users, started_at, row['elapsed_s']))
+                    results.setdefault(route, {})[mode] = row
+                    self.stdout.write(
+                        f'{mode:5} {route:14} rps={row["rps"]:8.1f} p50={row["p50_ms"]:8.2f}ms '
+                        f'p95={row["p95_ms"]:8.2f}ms p99={row["p99_ms"]:8.2f}ms erros={row["errors"]} '
+                        f'estados={row["status_codes"]}'
+                    )
+                    if route == 'process_task':
+                        style = self.style.ERROR if row['duplicate_credits'] else self.style.SUCCESS
+                        self.stdout.write(style(
+                            f'      créditos={row["credits"]} tarefas={row["tasks"]} '
+                            f'créditos/s={row["credits_per_s"]:.1f} duplicados={row["duplicate_credits"]}'
+                        ))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+        if options['output']:
+            report = {
+                'meta': {
+                    'timestamp': datetime.now(dt_timezone.utc).isoformat(),
+                    'revision': git_revision(),
+                    'workers': options['workers'],
+                    'concurrency': options['concurrency'],
+                    'requests': options['requests'],
+                },
+                'routes': results,
+            }
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Resultados gravados em {options["output"]}'))
+
+    def _sessions(self, users):
+        """Cookies de sessão e CSRF para cada utilizador, gravados na base partilhada com o servidor."""
+        sessions = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            csrf = get_random_string(32)
+            cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}; {settings.CSRF_COOKIE_NAME}={csrf}'
+            sessions.append({'Cookie': cookie, 'X-CSRFToken': csrf})
+        return sessions
+
+    def _start(self, mode, port, workers):
+        env = dict(os.environ, SERVER_MODE=mode, WEB_CONCURRENCY=str(workers))
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', str(settings.BASE_DIR / 'gunicorn.conf.py'), '--bind', f'127.0.0.1:{port}'],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'O gunicorn ({mode}) terminou ao arrancar.')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'O gunicorn ({mode}) não respondeu na porta {port}.')
+
+    def _run(self, port, route, sessions, options):
+        method, path = ROUTES[route], reverse(route)
+        base_headers = {
+            'Host': self.host,
+            'Origin': f'{self.scheme}://{self.host}',
+            'X-Forwarded-Proto': self.scheme,
+            'Content-Length': '0',
+        }
+        counter = iter(range(options['requests']))
+        lock = threading.Lock()
+        timings, statuses = [], Counter()
+
+        def worker():
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            while True:
+                with lock:
+                    index = next(counter, None)
+                if index is None:
+                    break
+                headers = dict(base_headers, **sessions[index % len(sessions)])
+                started = time.perf_counter()
+                try:
+                    conn.request(method, path, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    status = response.status
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    status = 'erro'
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    timings.append(elapsed)
+                    statuses[status] += 1
+            conn.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for _ in range(options['concurrency']):
+                pool.submit(worker)
+        elapsed = time.perf_counter() - started
+
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'rps': round(len(timings) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'p99_ms': round(percentile(timings, 99), 2),
+            'errors': statuses.pop('erro', 0),
+            'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+        }
+
+    def _verify_tasks(self, users, since, elapsed):
+        """Cada tarefa concluída durante a corrida tem de ter exatamente um crédito TAREFA no razão."""
+        user_ids = [u.pk for u in users]
+        tasks = Counter(dict(
+            Task.objects.filter(user_id__in=user_ids, completed_at__gte=since)
+            .values_list('user_id').annotate(n=Count('id'))
+        ))
+        credits = Counter(dict(
+            LedgerEntry.objects.filter(user_id__in=user_ids, kind=LedgerEntry.TAREFA, created_at__gte=since)
+            .values_list('user_id').annotate(n=Count('id'))
+        ))
+        total = sum(credits.values())
+        return {
+            'tasks': sum(tasks.values()),
+            'credits': total,
+            'credits_per_s': round(total / elapsed, 1) if elapsed else 0.0,
+            # Utilizadores com créditos a mais/a menos face às tarefas, ou mais de uma tarefa no dia
+            'duplicate_credits': sum(
+                1 for user_id in user_ids if credits[user_id] != tasks[user_id] or tasks[user_id] > 1
+            ),
+        }
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.ledger import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os contadores de saldo (BalanceSummary) a partir do histórico.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = rebuild_summaries(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'{count} resumos recalculados.'))
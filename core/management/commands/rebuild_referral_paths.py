@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.referrals import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói a tabela de fecho da rede de convites (ReferralPath) a partir de invited_by.'
+
+    def handle(self, *args, **options):
+        total = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{total} caminhos gravados.'))
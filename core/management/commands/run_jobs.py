@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa os jobs pendentes da fila (ex.: processamento de comprovativos). '
+        'Sem --loop termina quando a fila fica vazia; com --loop fica a aguardar novos jobs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Não termina; verifica a fila a cada --interval segundos.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Pausa entre verificações com a fila vazia.')
+        parser.add_argument('--batch-size', type=int, default=20, help='Jobs reclamados de cada vez.')
+
+    def handle(self, *args, **options):
+        total = failed_total = 0
+        try:
+            while True:
+                done, failed = jobs.run_pending(options['batch_size'])
+                total += done
+                failed_total += failed
+                if done:
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'{total} jobs executados, {failed_total} com erro.'))
@@ -0,0 +1,243 @@
+import random
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core import referrals
+from core.ledger import rebuild_summaries
+from core.models import CustomUser, Deposit, Level, Roulette, Task, UserLevel, Withdrawal
+
+DEFAULT_LEVELS = [
+    # nome, depósito, ganho diário, ciclo (dias)
+    ('Nível 1', Decimal('5000'), Decimal('250'), 60),
+    ('Nível 2', Decimal('15000'), Decimal('800'), 60),
+    ('Nível 3', Decimal('50000'), Decimal('2800'), 90),
+    ('Nível 4', Decimal('150000'), Decimal('9000'), 90),
+]
+ROULETTE_PRIZES = [Decimal('0'), Decimal('0'), Decimal('200'), Decimal('500'), Decimal('1000')]
+TRAINEE_EARNINGS = Decimal('450.00')
+NO_LEVEL = -1
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Permite gravar datas passadas em campos auto_now_add durante o bulk_create."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera dados sintéticos determinísticos (utilizadores, rede de convites, tarefas, '
+        'depósitos, saques e roleta) para testes de carga e benchmarks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Número de utilizadores a criar.')
+        parser.add_argument('--fanout', type=int, default=5, help='Convidados diretos por membro da rede.')
+        parser.add_argument('--invited-ratio', type=float, default=0.85, help='Fração de utilizadores com convidante.')
+        parser.add_argument('--investor-ratio', type=float, default=0.4, help='Fração de utilizadores com plano ativo.')
+        parser.add_argument('--days', type=int, default=30, help='Dias de histórico a gerar.')
+        parser.add_argument('--task-rate', type=float, default=0.7, help='Probabilidade diária de tarefa por investidor.')
+        parser.add_argument('--withdrawal-rate', type=float, default=0.05, help='Probabilidade diária de saque por investidor.')
+        parser.add_argument('--spin-rate', type=float, default=0.02, help='Probabilidade diária de giro na roleta.')
+        parser.add_argument('--heavy-users', type=int, default=0, help='Investidores com histórico extra (cenários de bench_routes).')
+        parser.add_argument('--heavy-withdrawals', type=int, default=0, help='Saques extra por utilizador pesado.')
+        parser.add_argument('--heavy-tasks', type=int, default=0, help='Tarefas extra por utilizador pesado (uma por dia, para trás).')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--password', default='angowork123', help='Senha comum a todos os utilizadores gerados.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        started = time.monotonic()
+
+        levels = self._ensure_levels()
+        user_levels, first_id = self._create_users(levels, options)
+        self._log(started, 'utilizadores')
+
+        paths = referrals.rebuild()
+        self._log(started, f'rede de convites ({paths} caminhos)')
+
+        self._create_history(levels, user_levels, first_id, options)
+        self._log(started, 'histórico')
+
+        if options['heavy_users']:
+            heavy = self._create_heavy_history(user_levels, first_id, options)
+            self._log(started, f'histórico extra de {heavy} utilizadores pesados')
+
+        rebuild_summaries(chunk_size=self.chunk_size)
+        self._log(started, 'resumos de saldo')
+        self.stdout.write(self.style.SUCCESS(f'{options["users"]} utilizadores gerados.'))
+
+    def _log(self, started, step):
+        self.stdout.write(f'[{time.monotonic() - started:8.1f}s] {step} concluído')
+
+    def _ensure_levels(self):
+        levels = list(Level.objects.order_by('deposit_value'))
+        if levels:
+            return levels
+        Level.objects.bulk_create([
+            Level(
+                name=name, deposit_value=deposit, daily_gain=gain,
+                monthly_gain=gain * 30, cycle_days=cycle, image='level_images/seed.png',
+            )
+            for name, deposit, gain, cycle in DEFAULT_LEVELS
+        ])
+        return list(Level.objects.order_by('deposit_value'))
+
+    def _create_users(self, levels, options):
+        rng = self.rng
+        total, fanout = options['users'], max(options['fanout'], 1)
+        password = make_password(options['password'])
+        first_id = (CustomUser.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        now = timezone.now()
+        user_levels = array('b')
+
+        for start in range(0, total, self.chunk_size):
+            batch = []
+            for index in range(start, min(start + self.chunk_size, total)):
+                # Árvore com `fanout` convidados por membro: o pai do índice i é (i - 1) // fanout
+                parent = None
+                if index > 0 and rng.random() < options['invited_ratio']:
+                    parent = first_id + (index - 1) // fanout
+                level = rng.randrange(len(levels)) if rng.random() < options['investor_ratio'] else NO_LEVEL
+                user_levels.append(level)
+                batch.append(CustomUser(
+                    id=first_id + index,
+                    phone_number=f'9{first_id + index:08d}',
+                    password=password,
+                    invited_by_id=parent,
+                    date_joined=now - timedelta(days=options['days'], seconds=rng.randrange(86400)),
+                    available_balance=Decimal(rng.randrange(0, 50000)),
+                    level_active=level != NO_LEVEL,
+                    roulette_spins=rng.randrange(0, 3),
+                    free_days_count=0 if level != NO_LEVEL else rng.randrange(0, 3),
+                ))
+            with transaction.atomic():
+                CustomUser.objects.bulk_create(batch)
+
+        # Os ids foram atribuídos aqui, por isso a sequência do Postgres tem de avançar
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [CustomUser]):
+                cursor.execute(sql)
+        return user_levels, first_id
+
+    def _create_history(self, levels, user_levels, first_id, options):
+        rng = self.rng
+        today = timezone.localdate()
+        days = [today - timedelta(days=offset) for offset in range(options['days'], 0, -1)]
+        work_days = [day for day in days if day.weekday() != 6]
+        tz = timezone.get_current_timezone()
+
+        def moment(day):
+            return timezone.make_aware(
+                datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randrange(9 * 3600, 17 * 3600)), tz
+            )
+
+        timestamp_fields = [
+            UserLevel._meta.get_field('purchase_date'),
+            Task._meta.get_field('completed_at'),
+            Deposit._meta.get_field('created_at'),
+            Withdrawal._meta.get_field('created_at'),
+            Roulette._meta.get_field('spin_date'),
+        ]
+        with explicit_timestamps(*timestamp_fields):
+            for start in range(0, len(user_levels), self.chunk_size):
+                purchases, tasks, deposits, withdrawals, spins = [], [], [], [], []
+                for index in range(start, min(start + self.chunk_size, len(user_levels))):
+                    user_id = first_id + index
+                    level_index = user_levels[index]
+
+                    if level_index == NO_LEVEL:
+                        # Estagiário: até dois dias de tarefas gratuitas
+                        for day in work_days[:rng.randrange(0, 3)]:
+                            tasks.append(Task(user_id=user_id, earnings=TRAINEE_EARNINGS, task_day=day, completed_at=moment(day)))
+                    else:
+                        level = levels[level_index]
+                        purchased = moment(days[0])
+                        deposits.append(Deposit(
+                            user_id=user_id, amount=level.deposit_value, payment_method='bank',
+                            payer_name=f'Cliente {user_id}', proof_of_payment='deposit_proofs/seed.jpg',
+                            is_approved=True, created_at=purchased,
+                        ))
+                        purchases.append(UserLevel(
+                            user_id=user_id, level=level, purchase_date=purchased, is_active=True,
+                            expires_at=UserLevel.cycle_end(level, purchased),
+                        ))
+                        for day in work_days:
+                            if rng.random() < options['task_rate']:
+                                tasks.append(Task(user_id=user_id, earnings=level.daily_gain, task_day=day, completed_at=moment(day)))
+                            if rng.random() < options['withdrawal_rate']:
+                                withdrawals.append(Withdrawal(
+                                    user_id=user_id, amount=Decimal(rng.choice([2000, 5000, 17000])) * Decimal('0.9'),
+                                    method='BANCO', withdrawal_details='Gerado por seed_load_data',
+                                    status=rng.choice(['Pendente', 'Aprovado', 'Aprovado', 'Recusado']),
+                                    created_at=moment(day), request_day=day,
+                                ))
+
+                    for day in work_days:
+                        if rng.random() < options['spin_rate']:
+                            spins.append(Roulette(user_id=user_id, prize=rng.choice(ROULETTE_PRIZES), spin_date=moment(day)))
+
+                with transaction.atomic():
+                    UserLevel.objects.bulk_create(purchases, batch_size=self.chunk_size)
+                    Deposit.objects.bulk_create(deposits, batch_size=self.chunk_size)
+                    Task.objects.bulk_create(tasks, batch_size=self.chunk_size)
+                    Withdrawal.objects.bulk_create(withdrawals, batch_size=self.chunk_size)
+                    Roulette.objects.bulk_create(spins, batch_size=self.chunk_size)
+
+    def _create_heavy_history(self, user_levels, first_id, options):
+        """Histórico longo para os primeiros `--heavy-users` investidores. Devolve quantos foram gerados."""
+        heavy = [first_id + index for index, level in enumerate(user_levels) if level != NO_LEVEL][:options['heavy_users']]
+        today = timezone.localdate()
+        tz = timezone.get_current_timezone()
+        statuses = ['Aprovado', 'Aprovado', 'Recusado']
+
+        with explicit_timestamps(Withdrawal._meta.get_field('created_at'), Task._meta.get_field('completed_at')):
+            for user_id in heavy:
+                # Antes do histórico normal (--days), para não repetir o dia de nenhuma tarefa
+                first_day = today - timedelta(days=options['days'] + 1)
+                tasks = []
+                for index in range(options['heavy_tasks']):
+                    day = first_day - timedelta(days=index)
+                    tasks.append(Task(
+                        user_id=user_id, earnings=Decimal('250'), task_day=day,
+                        completed_at=timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=10), tz),
+                    ))
+                Task.objects.bulk_create(tasks, batch_size=self.chunk_size)
+
+                batch = []
+                for index in range(options['heavy_withdrawals']):
+                    # 480 saques por dia ao minuto certo: muitos created_at repetidos,
+                    # o caso em que a paginação por cursor depende do desempate por id
+                    day = today - timedelta(days=1 + index // 480)
+                    created_at = timezone.make_aware(
+                        datetime.combine(day, datetime.min.time()) + timedelta(hours=9, minutes=(index % 480) // 2), tz
+                    )
+                    batch.append(Withdrawal(
+                        user_id=user_id, amount=Decimal('2000'), method='BANCO',
+                        withdrawal_details='Gerado por seed_load_data (pesado)', status=statuses[index % len(statuses)],
+                        created_at=created_at, request_day=day,
+                    ))
+                    if len(batch) >= self.chunk_size:
+                        Withdrawal.objects.bulk_create(batch)
+                        batch = []
+                Withdrawal.objects.bulk_create(batch)
+        return len(heavy)
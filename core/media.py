@@ -0,0 +1,171 @@
+import mimetypes
+import os
+import re
+import uuid
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.deconstruct import deconstructible
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+# --- FICHEIROS DE MEDIA ---
+# Substitui django.views.static.serve: ETag/Last-Modified com 304, pedidos
+# Range (retomar downloads, pré-visualização), cache longa e, se houver um
+# proxy à frente, entrega do ficheiro por X-Accel-Redirect (nginx) ou
+# X-Sendfile (Apache/lighttpd) sem ocupar o worker durante a transferência.
+#
+# Os uploads são gravados com um nome aleatório (UniqueUploadTo) que nunca é
+# reutilizado, nem depois de o ficheiro ser apagado (ex.: o original que
+# proofs.py substitui), por isso cada URL pode ser tratado como imutável.
+
+ACCEL_BACKENDS = ('nginx', 'sendfile')
+
+
+def _accel_backend(value):
+    if value and value not in ACCEL_BACKENDS:
+        raise ImproperlyConfigured(f"MEDIA_ACCEL tem de ser vazio, 'nginx' ou 'sendfile' (recebido {value!r}).")
+    return value
+
+
+MEDIA_ACCEL = _accel_backend(getattr(settings, 'MEDIA_ACCEL', ''))
+MEDIA_ACCEL_PREFIX = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_CACHE_MAX_AGE = getattr(settings, 'MEDIA_CACHE_MAX_AGE', 60 * 60 * 24 * 365)
+# Comprovativos de pagamento não devem ficar em caches partilhadas (CDN, proxies)
+PRIVATE_PREFIXES = ('deposit_proofs/',)
+CHUNK_SIZE = 64 * 1024
+
+@deconstructible
+class UniqueUploadTo:
+    """upload_to que troca o nome enviado (ex.: IMG_0001.jpg) por um uuid, mantendo a extensão."""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def __call__(self, instance, filename):
+        extension = os.path.splitext(filename)[1].lower()
+        return f'{self.prefix}{uuid.uuid4().hex}{extension}'
+
+    def __eq__(self, other):
+        return isinstance(other, UniqueUploadTo) and self.prefix == other.prefix
+
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _parse_range(header, size):
+    """Devolve (início, fim) inclusivos, None para ignorar o Range ou False se for insatisfazível."""
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None  # sintaxe inválida ou vários intervalos: responde com o ficheiro inteiro
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None  # intervalo inválido (fim antes do início): ignora-se o Range
+    if start >= size:
+        return False
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def _if_range_matches(request, etag, mtime):
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith(('"', 'W/')):
+        return value == etag
+    date = parse_http_date_safe(value)
+    return date is not None and int(mtime) <= date
+
+
+def _read(path, start, length):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = fh.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def serve(request, path, document_root=None):
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+    try:
+        fullpath = safe_join(document_root or settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Ficheiro não encontrado.')
+    try:
+        stat = os.stat(fullpath)
+    except OSError:
+        raise Http404('Ficheiro não encontrado.')
+    if not os.path.isfile(fullpath):
+        raise Http404('Ficheiro não encontrado.')
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    cache_scope = 'private' if path.startswith(PRIVATE_PREFIXES) else 'public'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': f'{cache_scope}, max-age={MEDIA_CACHE_MAX_AGE}, immutable',
+        'Accept-Ranges': 'bytes',
+    }
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        for name, value in headers.items():
+            not_modified.headers.setdefault(name, value)
+        return not_modified
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    if MEDIA_ACCEL:
+        # O proxy trata do envio (incluindo Range); aqui só se decide o ficheiro
+        response = HttpResponse(content_type=content_type)
+        if MEDIA_ACCEL == 'nginx':
+            response['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX + quote(path)
+        elif MEDIA_ACCEL == 'sendfile':
+            response['X-Sendfile'] = fullpath
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and _if_range_matches(request, etag, stat.st_mtime):
+        byte_range = _parse_range(request.META['HTTP_RANGE'], stat.st_size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        body = () if request.method == 'HEAD' else _read(fullpath, start, length)
+        response = StreamingHttpResponse(body, status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(length)
+    else:
+        # FileResponse usa wsgi.file_wrapper, que no gunicorn recorre a sendfile()
+        response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+        response['Content-Length'] = str(stat.st_size)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for name, value in headers.items():
+        response[name] = value
+    return response
@@ -0,0 +1,221 @@
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from django.db.backends.signals import connection_created
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+logger = logging.getLogger('core.metrics')
+
+# --- MÉTRICAS POR PEDIDO ---
+# Middleware opcional (REQUEST_METRICS_ENABLED): conta consultas e tempo de
+# base de dados, tempo de renderização de templates (ver template_backend.py)
+# e tempo total. Publica tudo no cabeçalho Server-Timing, numa linha de log
+# estruturada e num histograma em memória consultável em /metrics/.
+
+DUPLICATE_THRESHOLD = getattr(settings, 'REQUEST_METRICS_DUPLICATE_THRESHOLD', 3)
+WINDOW = getattr(settings, 'REQUEST_METRICS_WINDOW', 1000)
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+_NUMBERS = re.compile(r'\b\d+\b')
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            # Literais numéricos fora, para agrupar "o mesmo SQL com outro id"
+            self.statements[_NUMBERS.sub('?', sql)] += 1
+
+    def duplicates(self):
+        return {sql: count for sql, count in self.statements.items() if count >= DUPLICATE_THRESHOLD}
+
+
+def record_template_time(seconds):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.template_time += seconds
+
+
+def _percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+class RollingHistogram:
+    """Últimos WINDOW pedidos por view, guardados em memória do processo."""
+
+    def __init__(self, window=WINDOW):
+        self._window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self._window))
+        self._lock = threading.Lock()
+
+    def observe(self, view, total_ms, db_ms, queries):
+        with self._lock:
+            self._samples[view].append((total_ms, db_ms, queries))
+
+    def snapshot(self):
+        with self._lock:
+            samples = {view: list(rows) for view, rows in self._samples.items()}
+
+        report = {}
+        for view, rows in samples.items():
+            totals = sorted(row[0] for row in rows)
+            buckets = Counter()
+            for total_ms in totals:
+                bucket = next((f'le_{limit}ms' for limit in BUCKETS_MS if total_ms <= limit), 'gt_2500ms')
+                buckets[bucket] += 1
+            report[view] = {
+                'count': len(rows),
+                'p50_ms': round(_percentile(totals, 50), 2),
+                'p95_ms': round(_percentile(totals, 95), 2),
+                'p99_ms': round(_percentile(totals, 99), 2),
+                'db_ms_mean': round(sum(row[1] for row in rows) / len(rows), 2),
+                'queries_mean': round(sum(row[2] for row in rows) / len(rows), 2),
+                'queries_max': max(row[2] for row in rows),
+                'buckets': dict(buckets),
+            }
+        return report
+
+
+histogram = RollingHistogram()
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def _install_wrapper(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _install_wrapper(connection)
+
+
+class RequestMetricsMiddleware:
+    # Funciona nos dois modos: em ASGI as consultas correm noutras threads
+    # (sync_to_async), mas a contextvar acompanha-as e o wrapper instalado em
+    # cada ligação nova encontra as métricas do pedido certo.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        connection_created.connect(_on_connection_created, dispatch_uid='request_metrics')
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Ligações abertas antes de o middleware existir (ex.: no arranque)
+        for conn in connections.all(initialized_only=True):
+            _install_wrapper(conn)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._report(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._report(request, response, metrics, started)
+
+    def _report(self, request, response, metrics, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = metrics.db_time * 1000
+        template_ms = metrics.template_time * 1000
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else request.path
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db_ms:.1f};desc="{metrics.queries} queries"',
+            f'tpl;dur={template_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+        duplicates = metrics.duplicates()
+        logger.info(json.dumps({
+            'view': view,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'db_ms': round(db_ms, 2),
+            'template_ms': round(template_ms, 2),
+            'total_ms': round(total_ms, 2),
+            'duplicate_queries': sum(duplicates.values()),
+        }))
+        if duplicates:
+            worst_sql, worst_count = max(duplicates.items(), key=lambda item: item[1])
+            logger.warning('Possível N+1 em %s: %d execuções de %s', view, worst_count, worst_sql[:300])
+
+        histogram.observe(view, total_ms, db_ms, metrics.queries)
+        return response
+
+
+# --- FICHEIROS ESTÁTICOS (WSGI E ASGI) ---
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise que também aceita pedidos assíncronos.
+
+    O WhiteNoiseMiddleware só é síncrono: em ASGI obrigaria o Django a correr
+    toda a cadeia (e as views async) numa thread. Aqui só a leitura do
+    ficheiro estático passa por sync_to_async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,70 @@
+# Generated by Django 6.0.4 on 2026-10-18 14:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_summaries(apps, schema_editor):
+    CustomUser = apps.get_model('core', 'CustomUser')
+    BalanceSummary = apps.get_model('core', 'BalanceSummary')
+    Deposit = apps.get_model('core', 'Deposit')
+    Withdrawal = apps.get_model('core', 'Withdrawal')
+    Task = apps.get_model('core', 'Task')
+
+    def totals(queryset, field):
+        return dict(queryset.order_by().values('user').annotate(total=Sum(field)).values_list('user', 'total'))
+
+    deposits = totals(Deposit.objects.filter(is_approved=True), 'amount')
+    withdrawals = totals(Withdrawal.objects.filter(status='Aprovado'), 'amount')
+    tasks = totals(Task.objects.all(), 'earnings')
+
+    batch = []
+    for user_id, subsidy in CustomUser.objects.values_list('pk', 'subsidy_balance').iterator(chunk_size=2000):
+        batch.append(BalanceSummary(
+            user_id=user_id,
+            deposits_total=deposits.get(user_id) or 0,
+            withdrawals_total=withdrawals.get(user_id) or 0,
+            task_income_total=tasks.get(user_id) or 0,
+            subsidy_total=subsidy or 0,
+        ))
+        if len(batch) >= 2000:
+            BalanceSummary.objects.bulk_create(batch)
+            batch = []
+    BalanceSummary.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_customuser_free_days_count_task_task_day'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('deposits_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Depósitos Aprovados')),
+                ('withdrawals_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Saques Aprovados')),
+                ('task_income_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Rendimento de Tarefas')),
+                ('subsidy_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Subsídios Recebidos')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('deposito', 'Depósito'), ('saque', 'Saque'), ('tarefa', 'Tarefa'), ('subsidio', 'Subsídio'), ('nivel', 'Compra de Nível'), ('roleta', 'Roleta')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='core_ledger_user_id_2b2896_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
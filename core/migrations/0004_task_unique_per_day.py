@@ -0,0 +1,38 @@
+# Generated by Django 6.0.4 on 2026-10-18 14:42
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def mark_legacy_duplicates(apps, schema_editor):
+    Task = apps.get_model('core', 'Task')
+    groups = (
+        Task.objects.order_by()
+        .values('user', 'task_day')
+        .annotate(total=Count('id'), first_id=Min('id'))
+        .filter(total__gt=1)
+    )
+    for group in groups.iterator():
+        Task.objects.filter(user=group['user'], task_day=group['task_day']).exclude(
+            pk=group['first_id']
+        ).update(is_legacy_duplicate=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_ledgerentry_balancesummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='is_legacy_duplicate',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_legacy_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_legacy_duplicate', False)), fields=('user', 'task_day'), name='unique_task_per_user_day'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.4 on 2026-10-18 14:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    connection = schema_editor.connection
+    path_table = connection.ops.quote_name(apps.get_model('core', 'ReferralPath')._meta.db_table)
+    user_table = connection.ops.quote_name(apps.get_model('core', 'CustomUser')._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {path_table} (ancestor_id, descendant_id, depth) '
+            f'SELECT invited_by_id, id, 1 FROM {user_table} WHERE invited_by_id IS NOT NULL'
+        )
+        inserted, depth = cursor.rowcount, 1
+        while inserted > 0:
+            cursor.execute(
+                f'INSERT INTO {path_table} (ancestor_id, descendant_id, depth) '
+                f'SELECT p.ancestor_id, u.id, p.depth + 1 '
+                f'FROM {path_table} p JOIN {user_table} u ON u.invited_by_id = p.descendant_id '
+                f'WHERE p.depth = %s',
+                [depth],
+            )
+            inserted, depth = cursor.rowcount, depth + 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_task_unique_per_day'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferralPath',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='downline_paths', to=settings.AUTH_USER_MODEL)),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upline_paths', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ancestor', 'depth'], name='core_referr_ancesto_be8c58_idx'), models.Index(fields=['descendant', 'depth'], name='core_referr_descend_6fb8b1_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_referral_path')],
+            },
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.4 on 2026-10-18 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_referralpath'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roulettesettings',
+            name='weights',
+            field=models.CharField(blank=True, help_text='Peso de cada prémio, na mesma ordem. Ex: 10,5,1. Vazio usa os pesos padrão.', max_length=255),
+        ),
+    ]
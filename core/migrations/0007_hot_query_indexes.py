@@ -0,0 +1,58 @@
+# Generated by Django 6.0.4 on 2026-10-18 14:46
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_request_day(apps, schema_editor):
+    Withdrawal = apps.get_model('core', 'Withdrawal')
+    batch = []
+    for withdrawal in Withdrawal.objects.only('id', 'created_at').iterator(chunk_size=2000):
+        withdrawal.request_day = timezone.localdate(withdrawal.created_at)
+        batch.append(withdrawal)
+        if len(batch) >= 2000:
+            Withdrawal.objects.bulk_update(batch, ['request_day'])
+            batch = []
+    Withdrawal.objects.bulk_update(batch, ['request_day'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_roulettesettings_weights'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='withdrawal',
+            name='request_day',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.RunPython(backfill_request_day, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='task',
+            name='task_day',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['user'], name='deposit_user_approved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roulette',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['-spin_date'], name='roulette_recent_winners_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'task_day'], name='task_user_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlevel',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user'], name='userlevel_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['user', 'request_day', 'status'], name='withdrawal_user_day_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.4 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='withdrawal_user_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.4 on 2026-10-18 14:48
+
+from django.db import migrations, models
+
+
+def create_sequence(apps, schema_editor):
+    InviteCodeSequence = apps.get_model('core', 'InviteCodeSequence')
+    InviteCodeSequence.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_withdrawal_recent_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InviteCodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.4 on 2026-10-18 15:15
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_expires_at(apps, schema_editor):
+    # Um UPDATE por nível: as linhas nunca passam pela memória do Python
+    Level = apps.get_model('core', 'Level')
+    UserLevel = apps.get_model('core', 'UserLevel')
+    for level in Level.objects.only('id', 'cycle_days'):
+        UserLevel.objects.filter(level=level, expires_at__isnull=True).update(
+            expires_at=F('purchase_date') + timedelta(days=level.cycle_days)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_job_deposit_proof_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userlevel',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='userlevel',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['expires_at'], name='userlevel_active_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.4 on 2026-10-18 15:33
+
+import core.media
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_userlevel_expires_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='deposit',
+            name='proof_of_payment',
+            field=models.ImageField(upload_to=core.media.UniqueUploadTo('deposit_proofs/')),
+        ),
+        migrations.AlterField(
+            model_name='deposit',
+            name='proof_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to=core.media.UniqueUploadTo('deposit_proofs/thumbs/')),
+        ),
+        migrations.AlterField(
+            model_name='level',
+            name='image',
+            field=models.ImageField(upload_to=core.media.UniqueUploadTo('level_images/')),
+        ),
+    ]
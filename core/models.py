@@ -1,7 +1,11 @@
-from django.db import models
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
-import uuid
+
+from .media import UniqueUploadTo
 
 # --- GERENCIADOR DE USUÁRIO ---
 class CustomUserManager(BaseUserManager):
@@ -19,6 +23,11 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault('is_active', True)
         return self.create_user(phone_number, password, **extra_fields)
 
+    def bulk_create(self, objs, *args, **kwargs):
+        # Os códigos de convite são atribuídos antes, numa única reserva
+        from .invite_codes import assign_codes
+        return super().bulk_create(assign_codes(list(objs)), *args, **kwargs)
+
 # --- MODELO DE USUÁRIO ---
 class CustomUser(AbstractBaseUser, PermissionsMixin):
     phone_number = models.CharField(max_length=20, unique=True, verbose_name="Número de Telefone")
@@ -45,14 +54,51 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.phone_number
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Convidante gravado, para detetar mudanças em save()
+        if 'invited_by_id' in instance.__dict__:
+            instance._saved_invited_by_id = instance.invited_by_id
+        return instance
+
+    def clean(self):
+        super().clean()
+        if self.pk and self.invited_by_id:
+            from .referrals import is_in_downline
+            if is_in_downline(self.pk, self.invited_by_id):
+                raise ValidationError({'invited_by': 'O convidante não pode ser o próprio utilizador nem alguém da sua rede.'})
+
     def save(self, *args, **kwargs):
         if not self.invite_code:
-            while True:
-                new_invite_code = uuid.uuid4().hex[:8].upper()
-                if not CustomUser.objects.filter(invite_code=new_invite_code).exists():
-                    self.invite_code = new_invite_code
-                    break
-        super().save(*args, **kwargs)
+            from .invite_codes import next_code
+            self.invite_code = next_code()
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        moved = (
+            not adding and hasattr(self, '_saved_invited_by_id')
+            and self.invited_by_id != self._saved_invited_by_id
+            and (update_fields is None or 'invited_by' in update_fields or 'invited_by_id' in update_fields)
+        )
+        linked = adding and self.invited_by_id
+        if not (linked or moved):
+            super().save(*args, **kwargs)
+        else:
+            from .referrals import link_user, move_user
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                # Novo membro: regista os caminhos até todos os convidantes acima
+                if linked:
+                    link_user(self)
+                # Convidante alterado (ex.: no admin): a rede inteira muda de ramo
+                else:
+                    move_user(self.pk, self.invited_by_id)
+        self._saved_invited_by_id = self.invited_by_id
+
+class InviteCodeSequence(models.Model):
+    # Linha única com o próximo número livre (ver invite_codes.py)
+    SINGLETON_ID = 1
+    next_value = models.BigIntegerField(default=0)
 
 # --- CONFIGURAÇÕES E BANCOS ---
 class PlatformSettings(models.Model):
@@ -78,10 +124,17 @@ class Deposit(models.Model):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     payment_method = models.CharField(max_length=50)
     payer_name = models.CharField(max_length=255, blank=True, null=True)
-    proof_of_payment = models.ImageField(upload_to='deposit_proofs/')
+    proof_of_payment = models.ImageField(upload_to=UniqueUploadTo('deposit_proofs/'))
+    # Miniatura gerada pelo worker (ver proofs.py); vazia até o job correr
+    proof_thumbnail = models.ImageField(upload_to=UniqueUploadTo('deposit_proofs/thumbs/'), blank=True, editable=False)
     is_approved = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Parciais em vez de (user, flag): o SQLite compila `flag=True` para um
+        # termo booleano simples, que só um índice parcial consegue servir
+        indexes = [models.Index(fields=['user'], condition=models.Q(is_approved=True), name='deposit_user_approved_idx')]
+
 class Withdrawal(models.Model):
     STATUS_CHOICES = [('Pendente', 'Pendente'), ('Aprovado', 'Aprovado'), ('Recusado', 'Recusado')]
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -91,6 +144,14 @@ class Withdrawal(models.Model):
     withdrawal_details = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pendente')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Dia do pedido (hora de Luanda), para o limite diário sem usar created_at__date
+    request_day = models.DateField(default=timezone.localdate)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'request_day', 'status'], name='withdrawal_user_day_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='withdrawal_user_recent_idx'),
+        ]
 
 # --- NÍVEIS E TAREFAS ---
 class Level(models.Model):
@@ -99,7 +160,7 @@ class Level(models.Model):
     daily_gain = models.DecimalField(max_digits=12, decimal_places=2)
     monthly_gain = models.DecimalField(max_digits=12, decimal_places=2)
     cycle_days = models.IntegerField()
-    image = models.ImageField(upload_to='level_images/')
+    image = models.ImageField(upload_to=UniqueUploadTo('level_images/'))
     def __str__(self): return self.name
 
 class UserLevel(models.Model):
@@ -107,13 +168,44 @@ class UserLevel(models.Model):
     level = models.ForeignKey(Level, on_delete=models.CASCADE)
     purchase_date = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
+    # Fim do ciclo (compra + level.cycle_days); o comando expire_levels desativa-o
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user'], condition=models.Q(is_active=True), name='userlevel_user_active_idx'),
+            # Só as linhas ativas: o índice não cresce com o histórico de planos expirados
+            models.Index(fields=['expires_at'], name='userlevel_active_expiry_idx', condition=models.Q(is_active=True)),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.expires_at is None and self.level_id:
+            self.expires_at = self.cycle_end(self.level, self.purchase_date or timezone.now())
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def cycle_end(level, purchase_date):
+        return purchase_date + timedelta(days=level.cycle_days)
 
 class Task(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     earnings = models.DecimalField(max_digits=12, decimal_places=2)
     completed_at = models.DateTimeField(auto_now_add=True)
     # Útil para validar o dia da semana e histórico
-    task_day = models.DateField(default=timezone.now)
+    task_day = models.DateField(default=timezone.localdate)
+    # Linhas repetidas no mesmo dia criadas antes da restrição única
+    is_legacy_duplicate = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'task_day'],
+                condition=models.Q(is_legacy_duplicate=False),
+                name='unique_task_per_user_day',
+            ),
+        ]
+        # A restrição acima é parcial, por isso não serve consultas sem a condição
+        indexes = [models.Index(fields=['user', 'task_day'], name='task_user_day_idx')]
 
 # --- ROLETA ---
 class Roulette(models.Model):
@@ -122,6 +214,103 @@ class Roulette(models.Model):
     spin_date = models.DateTimeField(auto_now_add=True)
     is_approved = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-spin_date'], condition=models.Q(is_approved=True), name='roulette_recent_winners_idx'),
+        ]
+
 class RouletteSettings(models.Model):
     prizes = models.CharField(max_length=255, help_text="Ex: 0,500,1000")
-    
\ No newline at end of file
+    weights = models.CharField(
+        max_length=255, blank=True,
+        help_text="Peso de cada prémio, na mesma ordem. Ex: 10,5,1. Vazio usa os pesos padrão.",
+    )
+
+    def clean(self):
+        from .roulette import parse_prizes, parse_weights
+        try:
+            prizes = parse_prizes(self.prizes)
+            parse_weights(self.weights, prizes)
+        except ValueError as e:
+            raise ValidationError(str(e))
+    
+
+# --- EXTRATO E TOTAIS POR UTILIZADOR ---
+class LedgerEntry(models.Model):
+    DEPOSITO = 'deposito'
+    SAQUE = 'saque'
+    TAREFA = 'tarefa'
+    SUBSIDIO = 'subsidio'
+    NIVEL = 'nivel'
+    ROLETA = 'roleta'
+    KIND_CHOICES = [
+        (DEPOSITO, 'Depósito'),
+        (SAQUE, 'Saque'),
+        (TAREFA, 'Tarefa'),
+        (SUBSIDIO, 'Subsídio'),
+        (NIVEL, 'Compra de Nível'),
+        (ROLETA, 'Roleta'),
+    ]
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='ledger_entries')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Valor com sinal: créditos positivos, débitos negativos
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'created_at'])]
+
+class BalanceSummary(models.Model):
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='balance_summary')
+    deposits_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Depósitos Aprovados")
+    withdrawals_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Saques Aprovados")
+    task_income_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Rendimento de Tarefas")
+    subsidy_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Subsídios Recebidos")
+
+
+# --- REDE DE CONVITES (TABELA DE FECHO) ---
+class ReferralPath(models.Model):
+    ancestor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='downline_paths')
+    descendant = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='upline_paths')
+    # 1 = convidado direto, 2 = convidado do convidado, ...
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_referral_path'),
+        ]
+        indexes = [
+            models.Index(fields=['ancestor', 'depth']),
+            models.Index(fields=['descendant', 'depth']),
+        ]
+
+
+# --- FILA DE TAREFAS EM SEGUNDO PLANO ---
+class Job(models.Model):
+    PENDENTE = 'pendente'
+    EM_CURSO = 'em_curso'
+    CONCLUIDO = 'concluido'
+    FALHOU = 'falhou'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (EM_CURSO, 'Em curso'),
+        (CONCLUIDO, 'Concluído'),
+        (FALHOU, 'Falhou'),
+    ]
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDENTE)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx')]
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk} ({self.status})'
@@ -0,0 +1,82 @@
+import base64
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# --- PAGINAÇÃO POR CURSOR (KEYSET) ---
+# Em vez de OFFSET, cada página continua a partir do último (created_at, id)
+# visto; o custo é o mesmo na primeira página e na milésima.
+
+PAGE_SIZE = 20
+
+
+def encode_cursor(created_at, pk):
+    raw = f'{created_at.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Devolve (created_at, pk); levanta ValueError se o cursor for inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split('|')
+        created_at, pk = datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError('Cursor inválido.') from e
+    # encode_cursor só produz datas com fuso e ids positivos de 64 bits
+    if created_at.tzinfo is None or not 0 < pk < 2 ** 63:
+        raise ValueError('Cursor inválido.')
+    return created_at, pk
+
+
+def keyset_page(queryset, cursor=None, size=PAGE_SIZE):
+    """Devolve (linhas, próximo cursor ou None), do mais recente para o mais antigo."""
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        # O created_at__lte redundante dá ao índice (user, -created_at, -id) um
+        # limite para saltar; só com o OR o SQLite percorre as páginas anteriores
+        queryset = queryset.filter(created_at__lte=created_at).filter(Q(created_at__lt=created_at) | Q(id__lt=pk))
+
+    rows = list(queryset[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].pk)
+    return rows, next_cursor
+
+
+# --- CONTAGEM ESTIMADA (ADMIN) ---
+# Numa listagem sem filtros, o COUNT(*) de uma tabela grande percorre-a toda.
+# Em Postgres usa-se a estimativa mantida pelo ANALYZE (pg_class.reltuples)
+# quando ela passa de ESTIMATE_THRESHOLD; abaixo disso, ou com filtros, a
+# contagem é exata.
+
+ESTIMATE_THRESHOLD = 100_000
+
+
+def estimated_row_count(model, using='default'):
+    """Número aproximado de linhas da tabela, ou None se a base não o souber."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        row = cursor.fetchone()
+    # -1 = tabela ainda sem ANALYZE
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
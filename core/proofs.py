@@ -0,0 +1,75 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .jobs import PermanentJobError
+from .models import Deposit
+
+# --- PROCESSAMENTO DOS COMPROVATIVOS DE DEPÓSITO ---
+# Corre no worker (run_jobs), nunca no pedido: valida a imagem, corrige a
+# orientação, remove metadados (EXIF/GPS), reduz o original para um JPEG de
+# tamanho razoável e gera a miniatura usada no admin.
+
+ALLOWED_FORMATS = {'JPEG', 'MPO', 'PNG', 'WEBP', 'GIF', 'BMP'}
+MAX_DIMENSION = getattr(settings, 'DEPOSIT_PROOF_MAX_DIMENSION', 2000)
+THUMBNAIL_DIMENSION = getattr(settings, 'DEPOSIT_PROOF_THUMBNAIL_DIMENSION', 320)
+JPEG_QUALITY = 85
+
+
+class InvalidProof(PermanentJobError):
+    pass
+
+
+def _load(data):
+    try:
+        with Image.open(BytesIO(data)) as probe:
+            if probe.format not in ALLOWED_FORMATS:
+                raise InvalidProof(f'Formato de imagem não suportado: {probe.format}')
+            probe.verify()
+        image = Image.open(BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as exc:
+        raise InvalidProof(f'Comprovativo não é uma imagem válida: {exc}') from exc
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        # Fundo branco em vez de preto nas zonas transparentes
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, max_dimension):
+    resized = image.copy()
+    resized.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    buffer = BytesIO()
+    # Sem exif=..., o JPEG sai sem metadados
+    resized.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def process_deposit_proof(deposit_id):
+    deposit = Deposit.objects.filter(pk=deposit_id).first()
+    if deposit is None or not deposit.proof_of_payment or deposit.proof_thumbnail:
+        return  # removido entretanto ou já processado
+
+    original = deposit.proof_of_payment
+    old_name = original.name
+    with original.open('rb') as fh:
+        image = _load(fh.read())
+
+    # Só a extensão conta: UniqueUploadTo dá um nome novo a cada ficheiro, por
+    # isso apagar o original abaixo nunca liberta um URL que volte a ser usado
+    original.save('proof.jpg', ContentFile(_encode(image, MAX_DIMENSION)), save=False)
+    deposit.proof_thumbnail.save('proof.jpg', ContentFile(_encode(image, THUMBNAIL_DIMENSION)), save=False)
+
+    # update() em vez de save(): não sobrepõe uma aprovação feita entretanto no admin
+    Deposit.objects.filter(pk=deposit.pk).update(
+        proof_of_payment=original.name, proof_thumbnail=deposit.proof_thumbnail.name,
+    )
+    if original.name != old_name:
+        original.storage.delete(old_name)
@@ -0,0 +1,101 @@
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef, Q
+
+from .models import CustomUser, ReferralPath, UserLevel
+
+# --- REDE DE CONVITES ---
+# ReferralPath guarda uma linha (ancestral, descendente, profundidade) por cada
+# par da árvore `invited_by`. Subir ou descer N níveis passa a ser uma única
+# consulta indexada, sem seguir a FK salto a salto.
+
+
+def link_user(user):
+    """Cria os caminhos de um novo membro a partir dos caminhos de quem o convidou."""
+    parent_id = user.invited_by_id
+    rows = [ReferralPath(ancestor_id=parent_id, descendant_id=user.pk, depth=1)]
+    for ancestor_id, depth in ReferralPath.objects.filter(descendant_id=parent_id).values_list('ancestor_id', 'depth'):
+        rows.append(ReferralPath(ancestor_id=ancestor_id, descendant_id=user.pk, depth=depth + 1))
+    ReferralPath.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def is_in_downline(user_id, candidate_id):
+    """True se `candidate_id` for o próprio `user_id` ou estiver na rede abaixo dele."""
+    return candidate_id == user_id or ReferralPath.objects.filter(ancestor_id=user_id, descendant_id=candidate_id).exists()
+
+
+def move_user(user_id, new_parent_id):
+    """Pendura `user_id` e toda a sua rede sob `new_parent_id` (ou em nenhum, se None).
+
+    Os caminhos internos da rede movida não mudam: apagam-se só os que ligam
+    a rede aos antigos convidantes e inserem-se os que a ligam aos novos.
+    """
+    path_table = connection.ops.quote_name(ReferralPath._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {path_table} '
+            f'WHERE ancestor_id IN (SELECT ancestor_id FROM {path_table} WHERE descendant_id = %s) '
+            f'AND (descendant_id = %s OR descendant_id IN (SELECT descendant_id FROM {path_table} WHERE ancestor_id = %s))',
+            [user_id, user_id, user_id],
+        )
+        if new_parent_id is None:
+            return
+        cursor.execute(
+            f'INSERT INTO {path_table} (ancestor_id, descendant_id, depth) '
+            f'SELECT a.ancestor_id, s.descendant_id, a.depth + s.depth + 1 '
+            f'FROM (SELECT ancestor_id, depth FROM {path_table} WHERE descendant_id = %s '
+            f'      UNION ALL SELECT %s, 0) a '
+            f'CROSS JOIN (SELECT descendant_id, depth FROM {path_table} WHERE ancestor_id = %s '
+            f'      UNION ALL SELECT %s, 0) s',
+            [new_parent_id, new_parent_id, user_id, user_id],
+        )
+
+
+def upline_ids(user_id, depth=3):
+    """Ids dos convidantes acima de `user_id`, do mais próximo ao mais distante."""
+    return list(
+        ReferralPath.objects.filter(descendant_id=user_id, depth__lte=depth)
+        .order_by('depth')
+        .values_list('ancestor_id', flat=True)
+    )
+
+
+def downline_stats(user_id, depth=3):
+    """Devolve {nível: (membros, investidores)} para os níveis 1..depth."""
+    has_active_level = Exists(UserLevel.objects.filter(user=OuterRef('descendant_id'), is_active=True))
+    rows = (
+        ReferralPath.objects.filter(ancestor_id=user_id, depth__lte=depth)
+        .order_by()
+        .values('depth')
+        .annotate(members=Count('pk'), investors=Count('pk', filter=Q(has_active_level)))
+        .values_list('depth', 'members', 'investors')
+    )
+    stats = {level: (0, 0) for level in range(1, depth + 1)}
+    for level, members, investors in rows:
+        stats[level] = (members, investors)
+    return stats
+
+
+def rebuild():
+    """Reconstrói a tabela inteira a partir de `invited_by`, um nível por passo."""
+    path_table = connection.ops.quote_name(ReferralPath._meta.db_table)
+    user_table = connection.ops.quote_name(CustomUser._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {path_table}')
+        cursor.execute(
+            f'INSERT INTO {path_table} (ancestor_id, descendant_id, depth) '
+            f'SELECT invited_by_id, id, 1 FROM {user_table} WHERE invited_by_id IS NOT NULL'
+        )
+        total = inserted = cursor.rowcount
+        depth = 1
+        while inserted > 0:
+            cursor.execute(
+                f'INSERT INTO {path_table} (ancestor_id, descendant_id, depth) '
+                f'SELECT p.ancestor_id, u.id, p.depth + 1 '
+                f'FROM {path_table} p JOIN {user_table} u ON u.invited_by_id = p.descendant_id '
+                f'WHERE p.depth = %s',
+                [depth],
+            )
+            inserted = cursor.rowcount
+            total += inserted
+            depth += 1
+    return total
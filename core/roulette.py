@@ -0,0 +1,117 @@
+import random
+from bisect import bisect_right
+from decimal import Decimal, InvalidOperation
+from itertools import accumulate
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import F
+
+from . import ledger, user_cache
+from .config_cache import get_roulette_settings
+from .models import CustomUser, LedgerEntry, Roulette
+
+# --- SORTEIO DA ROLETA ---
+# O sorteador é compilado uma vez por versão de RouletteSettings (prémios e
+# pesos) e reutilizado: cada giro é só um random() e uma pesquisa binária
+# sobre os pesos acumulados.
+
+DEFAULT_PRIZES = '0,500,1000,0,5000,200,0,10000'
+
+
+def default_weight(amount):
+    """Pesos usados quando RouletteSettings.weights está vazio."""
+    if amount == 0:
+        return 10
+    if amount <= 500:
+        return 5
+    return 1
+
+
+def parse_prizes(raw):
+    prizes = [p.strip() for p in (raw or '').split(',') if p.strip()]
+    if not prizes:
+        raise ValueError('Indique pelo menos um prémio.')
+    try:
+        amounts = [Decimal(p) for p in prizes]
+    except InvalidOperation:
+        raise ValueError('Os prémios devem ser números separados por vírgula.')
+    if any(amount < 0 for amount in amounts):
+        raise ValueError('Os prémios não podem ser negativos.')
+    return prizes
+
+
+def parse_weights(raw, prizes):
+    if not (raw or '').strip():
+        return [default_weight(Decimal(p)) for p in prizes]
+    try:
+        weights = [int(w.strip()) for w in raw.split(',')]
+    except ValueError:
+        raise ValueError('Os pesos devem ser números inteiros separados por vírgula.')
+    if len(weights) != len(prizes):
+        raise ValueError('Deve existir um peso para cada prémio.')
+    if any(w < 0 for w in weights) or sum(weights) <= 0:
+        raise ValueError('Os pesos devem ser positivos.')
+    return weights
+
+
+class PrizeSampler:
+    def __init__(self, prizes, weights):
+        self.prizes = list(prizes)
+        self.amounts = [Decimal(p) for p in prizes]
+        self.weights = list(weights)
+        self._cumulative = list(accumulate(self.weights))
+        self._total = self._cumulative[-1]
+
+    def spin(self, rng=random):
+        """Devolve (texto do prémio, valor) escolhido segundo os pesos."""
+        index = bisect_right(self._cumulative, rng.random() * self._total)
+        return self.prizes[index], self.amounts[index]
+
+
+_compiled = (None, None)
+
+
+def get_sampler():
+    """Sorteador da configuração atual, recompilado só quando ela muda."""
+    global _compiled
+    roulette_settings = get_roulette_settings()
+    if roulette_settings and roulette_settings.prizes:
+        version = (roulette_settings.pk, roulette_settings.prizes, roulette_settings.weights)
+    else:
+        version = (None, DEFAULT_PRIZES, '')
+
+    cached_version, sampler = _compiled
+    if cached_version != version:
+        prizes = parse_prizes(version[1])
+        sampler = PrizeSampler(prizes, parse_weights(version[2], prizes))
+        _compiled = (version, sampler)
+    return sampler
+
+
+class SpinError(Exception):
+    """Giro recusado, com mensagem pronta para o utilizador."""
+
+
+def spin_for(user):
+    """Consome um giro, credita o prémio e regista-o. Devolve (prémio, giros restantes)."""
+    prize_label, prize_amount = get_sampler().spin()
+
+    with transaction.atomic():
+        # Decremento condicional: dois giros simultâneos nunca gastam o mesmo giro
+        consumed = CustomUser.objects.filter(pk=user.pk, roulette_spins__gt=0).update(
+            roulette_spins=F('roulette_spins') - 1
+        )
+        if not consumed:
+            raise SpinError('Sem giros disponíveis.')
+        user_cache.invalidate(user.pk)
+        if prize_amount:
+            ledger.post([(user.pk, LedgerEntry.ROLETA, prize_amount)])
+        Roulette.objects.create(user_id=user.pk, prize=prize_amount, is_approved=True)
+        remaining = CustomUser.objects.filter(pk=user.pk).values_list('roulette_spins', flat=True).get()
+
+    return prize_label, remaining
+
+
+# Giro inteiro numa thread: a transação não pode correr no ORM assíncrono
+aspin_for = sync_to_async(spin_for)
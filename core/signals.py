@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import config_cache, referrals, user_cache
+from .models import CustomUser, Level, PlatformBankDetails, PlatformSettings, RouletteSettings
+
+# --- INVALIDAÇÃO DE CACHES ---
+
+CONFIG_CACHE_KEYS = {
+    PlatformSettings: config_cache.PLATFORM_SETTINGS,
+    PlatformBankDetails: config_cache.PLATFORM_BANK_DETAILS,
+    RouletteSettings: config_cache.ROULETTE_SETTINGS,
+    Level: config_cache.LEVELS,
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_config_cache(sender, **kwargs):
+    key = CONFIG_CACHE_KEYS.get(sender)
+    if key:
+        config_cache.invalidate(key)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_cache(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+# --- REDE DE CONVITES ---
+@receiver(pre_delete, sender=CustomUser)
+def detach_downline(sender, instance, **kwargs):
+    # Os convidados ficam sem convidante (SET_NULL): a rede deixa de estar
+    # ligada a quem estava acima. Os caminhos do próprio caem em cascata.
+    referrals.move_user(instance.pk, None)
@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import commissions, ledger, task_status, user_cache
+from .commissions import commission_entries
+from .models import CustomUser, LedgerEntry, Task, UserLevel
+
+# --- MOTOR DE CONCLUSÃO DE TAREFAS ---
+# A garantia de "uma tarefa por dia" é a restrição única (user, task_day):
+# dois toques simultâneos tentam inserir a mesma linha e só um consegue.
+# Os créditos são aplicados com F() no mesmo bloco atómico, por isso não é
+# preciso bloquear o utilizador inteiro nem regravar a linha completa.
+
+TRAINEE_EARNINGS = Decimal('450.00')
+TRAINEE_MAX_DAYS = 2
+
+
+class TaskError(Exception):
+    """Recusa de tarefa com mensagem pronta para o utilizador."""
+
+
+DAILY_LIMIT_MESSAGE = 'Limite diário de tarefas alcançado.'
+
+
+def _check_day():
+    today = timezone.localdate()
+    if today.weekday() == 6:
+        raise TaskError('Hoje é feriado, volte amanhã.')
+    return today
+
+
+def _active_level_query(user):
+    return UserLevel.objects.filter(user=user, is_active=True).select_related('level')
+
+
+def complete_daily_task(user):
+    """Regista a tarefa do dia e credita o utilizador e a rede. Devolve o ganho."""
+    today = _check_day()
+    # Toques repetidos depois de feita a tarefa param aqui, sem ir à base
+    if task_status.is_done(user.pk, today):
+        raise TaskError(DAILY_LIMIT_MESSAGE)
+    return _record_task(user, _active_level_query(user).first(), today)
+
+
+async def acomplete_daily_task(user):
+    """Versão assíncrona: a leitura do plano usa o ORM assíncrono e só o bloco
+    transacional (que o ORM assíncrono não suporta) corre numa thread."""
+    today = _check_day()
+    if await task_status.ais_done(user.pk, today):
+        raise TaskError(DAILY_LIMIT_MESSAGE)
+    active_user_level = await _active_level_query(user).afirst()
+    return await sync_to_async(_record_task)(user, active_user_level, today)
+
+
+def _record_task(user, active_user_level, today):
+    task_earnings = active_user_level.level.daily_gain if active_user_level else TRAINEE_EARNINGS
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                Task.objects.create(user=user, earnings=task_earnings, task_day=today)
+        except IntegrityError:
+            # A tarefa de hoje já está confirmada por outro pedido
+            task_status.remember(user.pk, today)
+            raise TaskError(DAILY_LIMIT_MESSAGE)
+        task_status.mark_done(user.pk, today)
+
+        if not active_user_level:
+            # LOGICA DE ESTAGIÁRIO: só avança se ainda houver dias gratuitos
+            used = CustomUser.objects.filter(pk=user.pk, free_days_count__lt=TRAINEE_MAX_DAYS).update(
+                free_days_count=F('free_days_count') + 1
+            )
+            if not used:
+                raise TaskError('Seu período de estagiário terminou. Adquira um plano pago para continuar.')
+            user_cache.invalidate(user.pk)
+
+        entries = [(user.pk, LedgerEntry.TAREFA, task_earnings)]
+
+        # Comissões de rede (Apenas para planos pagos)
+        if active_user_level:
+            entries += commission_entries(user.pk, commissions.TASK, task_earnings)
+
+        ledger.post(entries)
+
+    return task_earnings
@@ -0,0 +1,61 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Task
+
+# --- ESTADO DA TAREFA DO DIA ---
+# Marca "já fez a tarefa de hoje" na cache, por utilizador e task_day, válida
+# até à meia-noite de Luanda. Só se guarda o estado positivo: escreve-se depois
+# do commit da tarefa e nunca volta atrás no mesmo dia. Sem marca (cache vazia
+# ou reiniciada) a resposta vem da base, e a restrição única (user, task_day)
+# continua a ser a garantia final contra tarefas a dobrar.
+
+CACHE_ALIAS = getattr(settings, 'TASK_STATUS_CACHE_ALIAS', 'default')
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _key(user_id, day):
+    return f'task_done:{user_id}:{day.isoformat()}'
+
+
+def seconds_until_midnight(now=None):
+    """Segundos até à próxima meia-noite no fuso da plataforma (Africa/Luanda)."""
+    local = timezone.localtime(now)
+    midnight = timezone.make_aware(datetime.combine(local.date() + timedelta(days=1), time.min))
+    return max(int((midnight - local).total_seconds()) + 1, 1)
+
+
+def remember(user_id, day):
+    """Grava a marca já (a tarefa tem de estar confirmada na base)."""
+    if day == timezone.localdate():
+        _cache().set(_key(user_id, day), True, seconds_until_midnight())
+
+
+def mark_done(user_id, day):
+    """Grava a marca quando a transação atual for confirmada."""
+    transaction.on_commit(lambda: remember(user_id, day))
+
+
+def is_done(user_id, day):
+    return _cache().get(_key(user_id, day), False)
+
+
+async def ais_done(user_id, day):
+    return await _cache().aget(_key(user_id, day), False)
+
+
+def completed_count(user_id, day):
+    """Tarefas do dia: 1 direto da cache quando há marca, senão conta na base."""
+    if is_done(user_id, day):
+        return 1
+    count = Task.objects.filter(user_id=user_id, task_day=day).count()
+    if count:
+        remember(user_id, day)
+    return count
@@ -0,0 +1,30 @@
+from django.db.models import Prefetch
+
+from .models import CustomUser, UserLevel
+from .referrals import downline_stats
+
+# --- ÁRVORE DA EQUIPA ---
+# Os três níveis da rede saem numa única consulta agrupada sobre a tabela de
+# fecho (ver referrals.py): por nível, total de membros e quantos têm plano ativo.
+
+TEAM_DEPTH = 3
+MEMBERS_PER_PAGE = 20
+
+
+def get_team_stats(user, depth=TEAM_DEPTH):
+    """Devolve {nível: (membros, investidores)} para os níveis 1..depth."""
+    return downline_stats(user.pk, depth)
+
+
+def direct_members(user):
+    """Membros do nível 1 com o plano ativo já carregado em `active_levels`."""
+    return (
+        CustomUser.objects.filter(invited_by=user)
+        .only('id', 'phone_number', 'date_joined')
+        .order_by('-date_joined', '-id')
+        .prefetch_related(Prefetch(
+            'userlevel_set',
+            queryset=UserLevel.objects.filter(is_active=True).select_related('level').order_by('pk'),
+            to_attr='active_levels',
+        ))
+    )
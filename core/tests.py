@@ -1,3 +1,1521 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+import base64
+import csv
+import json
+import math
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from itertools import count
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from django.contrib.messages import get_messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import (
+    commissions, config_cache, deposits, exports, invite_codes, jobs, ledger, levels, media, middleware, pagination, proofs,
+    referrals, roulette, task_engine, task_status, user_cache,
+)
+from . import views
+from .auth_backends import CachedModelBackend
+from .dashboard import get_dashboard_summary
+from .task_engine import TaskError
+from .models import (
+    BalanceSummary, BankDetails, CustomUser, Deposit, Job, LedgerEntry, Level, PlatformBankDetails, PlatformSettings,
+    ReferralPath, Roulette, RouletteSettings, Task, UserLevel, Withdrawal,
+)
+
+# --- ORÇAMENTO DE CONSULTAS POR VIEW ---
+# Número máximo de consultas SQL por pedido (sessão e utilizador incluídos).
+# Cada view é medida contra conjuntos de dados de tamanho crescente: o número
+# de consultas tem de ficar dentro do orçamento e não pode crescer com os dados.
+QUERY_BUDGETS = {
+    'menu': 3,
+    'renda': 3,
+    'tarefa': 4,
+    'nivel': 3,
+    'deposito': 2,
+    'saque': 4,
+    'perfil': 3,
+    'equipa': 5,
+    'roleta': 3,
+}
+DATASET_SIZES = (1, 10, 40)
+
+_phones = count(930000000)
+
+
+# Hosts do cliente de testes, sem redirecionamento HTTPS e com um hasher rápido
+test_settings = override_settings(
+    ALLOWED_HOSTS=['testserver'], SECURE_SSL_REDIRECT=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+
+
+def make_user(**kwargs):
+    return CustomUser.objects.create_user(str(next(_phones)), 'senha-teste', **kwargs)
+
+
+def make_level(**kwargs):
+    fields = dict(
+        name='Nível 1', deposit_value=Decimal('5000'), daily_gain=Decimal('250'),
+        monthly_gain=Decimal('7500'), cycle_days=60, image='level_images/teste.png',
+    )
+    fields.update(kwargs)
+    return Level.objects.create(**fields)
+
+
+def skip_without_concurrent_writes(test):
+    """Na base SQLite em memória as escritas concorrentes falham logo, sem esperar."""
+    return skipUnless(
+        connection.vendor != 'sqlite' or not connection.is_in_memory_db(),
+        'Corra com manage.py test (SQLite em ficheiro) ou noutra base de dados.',
+    )(test)
+
+
+def run_concurrently(func, threads):
+    """Chama `func()` em `threads` threads, todas libertadas ao mesmo tempo. Devolve (resultados, exceções)."""
+    barrier = threading.Barrier(threads)
+    results, errors = [], []
+
+    def worker():
+        try:
+            barrier.wait()
+            results.append(func())
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results, errors
+
+
+@test_settings
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        PlatformSettings.objects.create(
+            whatsapp_link='https://wa.me/0', history_text='h', deposit_instruction='d', withdrawal_instruction='w',
+        )
+        PlatformBankDetails.objects.create(bank_name='BAI', IBAN='AO06000000000000000000000', account_holder_name='Angowork')
+        RouletteSettings.objects.create(prizes='0,500,1000')
+        cls.level = make_level()
+        cls.user = make_user()
+        UserLevel.objects.create(user=cls.user, level=cls.level)
+        BankDetails.objects.create(user=cls.user, bank_name='BAI', IBAN='AO06000000000000000000001', account_holder_name='Teste')
+
+    def setUp(self):
+        config_cache.invalidate()
+        self.client.force_login(self.user)
+        self.grown_to = 0
+
+    def grow(self, size):
+        """Acrescenta dados até `size` linhas por relação do utilizador."""
+        for _ in range(self.grown_to, size):
+            member = make_user(invited_by=self.user)
+            UserLevel.objects.create(user=member, level=self.level)
+            make_user(invited_by=member)
+            Roulette.objects.create(user=member, prize=Decimal('500'), is_approved=True)
+            Withdrawal.objects.create(
+                user=self.user, amount=Decimal('1000'), method='BANCO', withdrawal_details='teste',
+            )
+        Task.objects.filter(user=self.user).delete()
+        self.grown_to = size
+
+    def count_queries(self, name):
+        url = reverse(name)
+        self.client.get(url, secure=True)  # aquece a cache de configurações
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200, name)
+        return captured
+
+    def test_views_stay_within_budget_as_data_grows(self):
+        for size in DATASET_SIZES:
+            self.grow(size)
+            for name, budget in QUERY_BUDGETS.items():
+                with self.subTest(view=name, size=size):
+                    captured = self.count_queries(name)
+                    sql = '\n'.join(query['sql'] for query in captured.captured_queries)
+                    self.assertLessEqual(
+                        len(captured), budget, f'{name} com {size} linhas fez {len(captured)} consultas:\n{sql}'
+                    )
+
+    def test_query_count_does_not_depend_on_data_size(self):
+        counts = {}
+        for size in DATASET_SIZES:
+            self.grow(size)
+            for name in QUERY_BUDGETS:
+                counts.setdefault(name, []).append(len(self.count_queries(name)))
+        for name, per_size in counts.items():
+            with self.subTest(view=name):
+                self.assertEqual(len(set(per_size)), 1, f'{name}: consultas por tamanho {dict(zip(DATASET_SIZES, per_size))}')
+
+
+# --- LISTAGENS DO ADMIN ---
+# Páginas de 100 linhas: o número de consultas não pode depender das linhas mostradas.
+ADMIN_CHANGELISTS = ['deposit', 'withdrawal', 'task', 'userlevel', 'roulette', 'bankdetails', 'customuser']
+ADMIN_PAGE_SIZES = (5, 100)
+
+
+@test_settings
+class AdminChangelistQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser(str(next(_phones)), 'senha-teste')
+        cls.level = make_level()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.grown_to = 0
+
+    def grow(self, size):
+        for _ in range(self.grown_to, size):
+            user = make_user()
+            Deposit.objects.create(
+                user=user, amount=Decimal('5000'), payment_method='bank', proof_of_payment='deposit_proofs/teste.jpg',
+            )
+            Withdrawal.objects.create(user=user, amount=Decimal('1000'), method='BANCO', withdrawal_details='teste')
+            Task.objects.create(user=user, earnings=Decimal('250'))
+            UserLevel.objects.create(user=user, level=self.level)
+            Roulette.objects.create(user=user, prize=Decimal('500'))
+            # Metade dos utilizadores sem dados bancários: "Não cadastrado" também não pode consultar
+            if self.grown_to % 2:
+                BankDetails.objects.create(user=user, bank_name='BAI', IBAN='AO06', account_holder_name='Teste')
+            self.grown_to += 1
+
+    def changelist_queries(self, model_name):
+        url = reverse(f'admin:core_{model_name}_changelist')
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200, model_name)
+        return len(captured)
+
+    def test_changelist_query_count_is_constant(self):
+        counts = {}
+        for size in ADMIN_PAGE_SIZES:
+            self.grow(size)
+            for model_name in ADMIN_CHANGELISTS:
+                counts.setdefault(model_name, []).append(self.changelist_queries(model_name))
+        for model_name, per_size in counts.items():
+            with self.subTest(changelist=model_name):
+                self.assertEqual(
+                    len(set(per_size)), 1, f'{model_name}: consultas por tamanho {dict(zip(ADMIN_PAGE_SIZES, per_size))}'
+                )
+
+
+# --- CACHE DO UTILIZADOR ---
+@test_settings
+class UserCacheTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(user_cache, 'ENABLED', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(caches[user_cache.CACHE_ALIAS].clear)
+        self.user = make_user()
+        self.backend = CachedModelBackend()
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as captured:
+            user = self.backend.get_user(self.user.pk)
+        return user, len(captured)
+
+    def test_second_load_comes_from_cache(self):
+        self.assertEqual(self.user_queries()[1], 1)
+        self.assertEqual(self.user_queries()[1], 0)
+
+    def test_balance_change_invalidates_after_commit(self):
+        self.user_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            ledger.post([(self.user.pk, LedgerEntry.TAREFA, Decimal('250'))])
+        user, queries = self.user_queries()
+        self.assertEqual(queries, 1)
+        self.assertEqual(user.available_balance, Decimal('250'))
+
+    def test_save_invalidates(self):
+        self.user_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.roulette_spins = 7
+            self.user.save()
+        self.assertEqual(self.user_queries()[0].roulette_spins, 7)
+
+    def test_lost_version_key_never_revives_old_objects(self):
+        self.user_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            user_cache.invalidate(self.user.pk)
+        # Chave de versão expirada ou despejada pela cache
+        caches[user_cache.CACHE_ALIAS].delete(user_cache._version_key(self.user.pk))
+        self.assertEqual(self.user_queries()[1], 1)
+
+    def test_version_keys_expire(self):
+        cache = caches[user_cache.CACHE_ALIAS]
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            self.user_queries()
+        self.assertEqual(add.call_args.args[2], user_cache.VERSION_TIMEOUT)
+        with mock.patch.object(cache, 'set_many', wraps=cache.set_many) as set_many:
+            user_cache._bump([self.user.pk])
+        self.assertEqual(set_many.call_args.args[1], user_cache.VERSION_TIMEOUT)
+        self.assertGreaterEqual(user_cache.VERSION_TIMEOUT, user_cache.TIMEOUT)
+
+    @override_settings(AUTHENTICATION_BACKENDS=['core.auth_backends.CachedModelBackend', 'core.tests.FallbackBackend'])
+    def test_wrong_password_continues_to_next_backend(self):
+        user = authenticate(phone_number=self.user.phone_number, password='errada')
+        self.assertEqual(user, self.user)
+        self.assertEqual(user.backend, 'core.tests.FallbackBackend')
+
+    def test_sessions_from_model_backend_still_load(self):
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get(reverse('perfil'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_login_uses_cached_backend(self):
+        user = authenticate(phone_number=self.user.phone_number, password='senha-teste')
+        self.assertEqual(user.backend, 'core.auth_backends.CachedModelBackend')
+
+
+class FallbackBackend:
+    """Backend seguinte na cadeia: aceita qualquer senha (só nos testes)."""
+
+    def authenticate(self, request, phone_number=None, password=None):
+        return CustomUser.objects.filter(phone_number=phone_number).first()
+
+    def get_user(self, user_id):
+        return CustomUser.objects.filter(pk=user_id).first()
+
+
+@test_settings
+class SignupTests(TestCase):
+    def test_signup_logs_in_new_user(self):
+        inviter = make_user()
+        response = self.client.post(reverse('cadastro'), {
+            'phone_number': '931999999', 'password': 'senha-teste', 'confirm_password': 'senha-teste',
+            'invited_by_code': inviter.invite_code,
+        }, secure=True)
+        self.assertRedirects(response, reverse('menu'), fetch_redirect_response=False)
+        user = CustomUser.objects.get(phone_number='931999999')
+        self.assertEqual(user.invited_by, inviter)
+        self.assertEqual(self.client.session['_auth_user_id'], str(user.pk))
+
+
+# --- ESTADO DA TAREFA DO DIA ---
+class TaskStatusTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        # Independente do dia da semana em que os testes correm
+        patcher = mock.patch.object(task_engine, '_check_day', return_value=self.today)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(caches[task_status.CACHE_ALIAS].clear)
+        self.user = make_user()
+
+    def test_marker_set_on_commit_short_circuits_next_attempt(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task_engine.complete_daily_task(self.user)
+        self.assertTrue(task_status.is_done(self.user.pk, self.today))
+        with self.assertNumQueries(0), self.assertRaisesMessage(TaskError, task_engine.DAILY_LIMIT_MESSAGE):
+            task_engine.complete_daily_task(self.user)
+
+    def test_rolled_back_task_leaves_no_marker(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(free_days_count=task_engine.TRAINEE_MAX_DAYS)
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(TaskError):
+            task_engine.complete_daily_task(self.user)
+        self.assertFalse(task_status.is_done(self.user.pk, self.today))
+        self.assertFalse(Task.objects.filter(user=self.user).exists())
+
+    def test_unique_constraint_is_the_fallback_without_marker(self):
+        Task.objects.create(user=self.user, earnings=Decimal('450'), task_day=self.today)
+        with self.assertRaisesMessage(TaskError, task_engine.DAILY_LIMIT_MESSAGE):
+            task_engine.complete_daily_task(self.user)
+        self.assertTrue(task_status.is_done(self.user.pk, self.today))
+        self.assertEqual(task_status.completed_count(self.user.pk, self.today), 1)
+
+    def test_marker_expires_at_luanda_midnight(self):
+        now = timezone.make_aware(datetime(2026, 10, 17, 23, 59, 30))
+        self.assertEqual(task_status.seconds_until_midnight(now), 31)
+
+
+# --- EXPIRAÇÃO DOS PLANOS ---
+class LevelExpiryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.level = make_level()
+
+    def buy(self, user, days_ago):
+        user_level = UserLevel.objects.create(user=user, level=self.level)
+        purchased = timezone.now() - timedelta(days=days_ago)
+        UserLevel.objects.filter(pk=user_level.pk).update(
+            purchase_date=purchased, expires_at=UserLevel.cycle_end(self.level, purchased)
+        )
+        return user_level
+
+    def test_expires_at_set_from_cycle_days(self):
+        user_level = UserLevel.objects.create(user=make_user(), level=self.level)
+        # purchase_date (auto_now_add) é preenchido instantes depois de expires_at
+        self.assertAlmostEqual(
+            user_level.expires_at, user_level.purchase_date + timedelta(days=60), delta=timedelta(seconds=1)
+        )
+
+    def test_expired_levels_deactivated_in_chunks(self):
+        expired_users = [make_user(level_active=True) for _ in range(3)]
+        for user in expired_users:
+            self.buy(user, days_ago=61)
+        # Outro plano ainda dentro do ciclo mantém o utilizador ativo
+        renewed = make_user(level_active=True)
+        self.buy(renewed, days_ago=61)
+        current = self.buy(renewed, days_ago=10)
+
+        self.assertEqual(levels.expire_levels(chunk_size=2), (4, 3))
+
+        self.assertFalse(CustomUser.objects.filter(pk__in=[u.pk for u in expired_users], level_active=True).exists())
+        self.assertTrue(CustomUser.objects.get(pk=renewed.pk).level_active)
+        self.assertEqual(list(UserLevel.objects.filter(is_active=True)), [current])
+        self.assertEqual(levels.expire_levels(), (0, 0))
+
+
+# --- REDE DE CONVITES ---
+class ReferralPathTests(TestCase):
+    def setUp(self):
+        # root -> a -> user -> child   e   parent -> b
+        self.root = make_user()
+        self.a = make_user(invited_by=self.root)
+        self.user = make_user(invited_by=self.a)
+        self.child = make_user(invited_by=self.user)
+        self.parent = make_user()
+        self.b = make_user(invited_by=self.parent)
+
+    def paths(self):
+        return set(ReferralPath.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def assertMatchesRebuild(self):
+        current = self.paths()
+        referrals.rebuild()
+        self.assertEqual(current, self.paths())
+
+    def uplines(self, user):
+        return [(pk, amount) for pk, _, amount in commissions.commission_entries(user.pk, commissions.TASK, Decimal('100'))]
+
+    def test_changing_inviter_moves_the_whole_downline(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.invited_by = self.b
+        user.save()
+
+        self.assertEqual(self.uplines(self.user), [(self.b.pk, Decimal('20.00')), (self.parent.pk, Decimal('3.00'))])
+        self.assertEqual(
+            self.uplines(self.child),
+            [(self.user.pk, Decimal('20.00')), (self.b.pk, Decimal('3.00')), (self.parent.pk, Decimal('2.00'))],
+        )
+        self.assertMatchesRebuild()
+
+    def test_removing_inviter_detaches_downline(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.invited_by = None
+        user.save()
+        self.assertEqual(self.uplines(self.user), [])
+        self.assertEqual(self.uplines(self.child), [(self.user.pk, Decimal('20.00'))])
+        self.assertMatchesRebuild()
+
+    def test_deleting_inviter_detaches_downline(self):
+        self.a.delete()
+        self.assertEqual(self.uplines(self.user), [])
+        self.assertMatchesRebuild()
+
+    def test_inviter_cannot_come_from_own_downline(self):
+        root = CustomUser.objects.get(pk=self.root.pk)
+        root.invited_by = self.child
+        with self.assertRaises(ValidationError):
+            root.full_clean(exclude=['password'])
+
+
+# --- COMISSÕES DA REDE ---
+class CommissionTests(TestCase):
+    def setUp(self):
+        # top -> middle (sem plano) -> inviter -> user
+        level = make_level()
+        self.top = make_user()
+        self.middle = make_user(invited_by=self.top)
+        self.inviter = make_user(invited_by=self.middle)
+        self.user = make_user(invited_by=self.inviter)
+        for member in (self.top, self.inviter, self.user):
+            UserLevel.objects.create(user=member, level=level)
+
+    def entries(self, kind, base='1000'):
+        return [(pk, amount) for pk, _, amount in commissions.commission_entries(self.user.pk, kind, Decimal(base))]
+
+    def test_inactive_upline_stops_level_purchase_chain(self):
+        self.assertEqual(self.entries(commissions.LEVEL_PURCHASE), [(self.inviter.pk, Decimal('150.00'))])
+
+    def test_inactive_upline_is_paid_for_tasks(self):
+        self.assertEqual(self.entries(commissions.TASK), [
+            (self.inviter.pk, Decimal('200.00')), (self.middle.pk, Decimal('30.00')), (self.top.pk, Decimal('20.00')),
+        ])
+
+    def test_rates_come_from_settings(self):
+        rates = {commissions.TASK: ('0.10', '0.05'), commissions.LEVEL_PURCHASE: ()}
+        with self.settings(COMMISSION_RATES=rates):
+            self.assertEqual(self.entries(commissions.TASK), [
+                (self.inviter.pk, Decimal('100.00')), (self.middle.pk, Decimal('50.00')),
+            ])
+            self.assertEqual(self.entries(commissions.LEVEL_PURCHASE), [])
+        with self.settings(COMMISSION_RATES={}):
+            self.assertEqual(self.entries(commissions.TASK)[0], (self.inviter.pk, Decimal('200.00')))
+
+    def test_single_query_for_the_whole_chain(self):
+        with self.assertNumQueries(1):
+            self.entries(commissions.TASK)
+
+
+# --- CACHE DAS CONFIGURAÇÕES ---
+@test_settings
+class ConfigCacheTests(TestCase):
+    def setUp(self):
+        config_cache.invalidate()
+        self.addCleanup(config_cache.invalidate)
+
+    def test_locmem_is_never_the_shared_tier(self):
+        with mock.patch.object(config_cache, 'CACHE_ALIAS', 'default'):
+            self.assertIsNone(config_cache._shared_cache())
+
+    def test_level_purchase_charges_current_price(self):
+        level = make_level()
+        user = make_user(available_balance=Decimal('20000'))
+        config_cache.get_levels()
+        # Alteração feita noutro processo: a cache deste ainda tem o preço antigo
+        Level.objects.filter(pk=level.pk).update(deposit_value=Decimal('8000'))
+        self.client.force_login(user)
+        response = self.client.post(reverse('nivel'), {'level_id': level.pk}, secure=True)
+        self.assertRedirects(response, reverse('nivel'), fetch_redirect_response=False)
+        user.refresh_from_db()
+        self.assertEqual(user.available_balance, Decimal('12000'))
+        self.assertTrue(UserLevel.objects.filter(user=user, level=level, is_active=True).exists())
+
+
+# --- CONCORRÊNCIA: TAREFA DO DIA ---
+@skip_without_concurrent_writes
+class ConcurrentTaskTests(TransactionTestCase):
+    THREADS = 10
+
+    def setUp(self):
+        patcher = mock.patch.object(task_engine, '_check_day', return_value=timezone.localdate())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(caches[task_status.CACHE_ALIAS].clear)
+
+    def test_parallel_completions_credit_exactly_once(self):
+        level = make_level()
+        top = make_user()
+        middle = make_user(invited_by=top)
+        inviter = make_user(invited_by=middle)
+        user = make_user(invited_by=inviter)
+        for member in (top, middle, inviter, user):
+            UserLevel.objects.create(user=member, level=level)
+
+        results, errors = run_concurrently(lambda: task_engine.complete_daily_task(user), self.THREADS)
+
+        self.assertEqual(results, [level.daily_gain])
+        self.assertEqual(len(errors), self.THREADS - 1)
+        self.assertTrue(all(isinstance(error, TaskError) for error in errors), errors)
+        self.assertEqual(Task.objects.filter(user=user).count(), 1)
+        self.assertEqual(
+            list(LedgerEntry.objects.filter(user=user).values_list('kind', 'amount')),
+            [(LedgerEntry.TAREFA, level.daily_gain)],
+        )
+        expected = {user.pk: Decimal('250'), inviter.pk: Decimal('50'), middle.pk: Decimal('7.50'), top.pk: Decimal('5')}
+        for member_id, amount in expected.items():
+            with self.subTest(user=member_id):
+                self.assertEqual(LedgerEntry.objects.filter(user_id=member_id).count(), 1)
+                self.assertEqual(CustomUser.objects.get(pk=member_id).available_balance, amount)
+
+
+# --- CONCORRÊNCIA: GIROS DA ROLETA ---
+@skip_without_concurrent_writes
+class ConcurrentSpinTests(TransactionTestCase):
+    THREADS = 12
+    SPINS = 5
+
+    def test_parallel_spins_never_overspend(self):
+        user = make_user(roulette_spins=self.SPINS)
+
+        results, errors = run_concurrently(lambda: roulette.spin_for(user), self.THREADS)
+
+        self.assertEqual(len(results), self.SPINS)
+        self.assertEqual(len(errors), self.THREADS - self.SPINS)
+        self.assertTrue(all(isinstance(error, roulette.SpinError) for error in errors), errors)
+        self.assertEqual(sorted(remaining for _, remaining in results), list(range(self.SPINS)))
+        user.refresh_from_db()
+        self.assertEqual(user.roulette_spins, 0)
+        self.assertEqual(Roulette.objects.filter(user=user).count(), self.SPINS)
+        won = sum(Roulette.objects.filter(user=user).values_list('prize', flat=True))
+        self.assertEqual(user.available_balance, won)
+
+
+# --- SORTEIO DA ROLETA ---
+class PrizeSamplerTests(TestCase):
+    SPINS = 100_000
+
+    def assertFollowsWeights(self, sampler, seed=20261018):
+        rng = random.Random(seed)
+        observed = Counter(sampler.spin(rng) for _ in range(self.SPINS))
+        total = sum(sampler.weights)
+        # Prémios repetidos (ex.: vários '0') somam as probabilidades
+        expected = Counter()
+        for prize, amount, weight in zip(sampler.prizes, sampler.amounts, sampler.weights):
+            expected[(prize, amount)] += weight / total
+        self.assertLessEqual(set(observed), set(expected))
+        for outcome, probability in expected.items():
+            with self.subTest(prize=outcome[0]):
+                # Quatro desvios-padrão da binomial: falso alarme ~1 em 15 000
+                tolerance = 4 * math.sqrt(self.SPINS * probability * (1 - probability))
+                self.assertAlmostEqual(observed[outcome], self.SPINS * probability, delta=tolerance)
+
+    def test_configured_weights(self):
+        prizes = roulette.parse_prizes('0,500,1000,5000')
+        self.assertFollowsWeights(roulette.PrizeSampler(prizes, roulette.parse_weights('50,30,15,5', prizes)))
+
+    def test_blank_weights_keep_legacy_tiers(self):
+        prizes = roulette.parse_prizes(roulette.DEFAULT_PRIZES)
+        weights = roulette.parse_weights('', prizes)
+        self.assertEqual(weights, [10, 5, 1, 10, 1, 5, 10, 1])
+        self.assertFollowsWeights(roulette.PrizeSampler(prizes, weights))
+
+    def test_zero_weight_is_never_drawn(self):
+        prizes = roulette.parse_prizes('0,10000')
+        sampler = roulette.PrizeSampler(prizes, roulette.parse_weights('1,0', prizes))
+        rng = random.Random(7)
+        self.assertEqual({sampler.spin(rng)[0] for _ in range(10_000)}, {'0'})
+
+
+# --- ÍNDICES DAS CONSULTAS FREQUENTES ---
+# O texto do EXPLAIN depende do motor; as verificações correm no SQLite e no
+# PostgreSQL. Com tabelas quase vazias o PostgreSQL prefere a leitura
+# sequencial, por isso desliga-se para o plano mostrar se o índice serve.
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'Plano verificado apenas no SQLite e no PostgreSQL.')
+class HotQueryIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+            self.addCleanup(self.reset_seqscan)
+
+    def reset_seqscan(self):
+        with connection.cursor() as cursor:
+            cursor.execute('RESET enable_seqscan')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_task_day(self):
+        today = timezone.localdate()
+        self.assertUsesIndex(Task.objects.filter(user=self.user, task_day=today), 'task_user_day_idx')
+
+    def test_withdrawal_request_day(self):
+        self.assertUsesIndex(
+            Withdrawal.objects.filter(user=self.user, request_day=timezone.localdate(), status__in=['Pendente', 'Aprovado']),
+            'withdrawal_user_day_idx',
+        )
+
+    def test_deposit_user_approved(self):
+        self.assertUsesIndex(Deposit.objects.filter(user=self.user, is_approved=True), 'deposit_user_approved_idx')
+
+    def test_userlevel_user_active(self):
+        self.assertUsesIndex(UserLevel.objects.filter(user=self.user, is_active=True), 'userlevel_user_active_idx')
+
+    def test_recent_roulette_winners(self):
+        self.assertUsesIndex(
+            Roulette.objects.filter(is_approved=True).order_by('-spin_date')[:10], 'roulette_recent_winners_idx'
+        )
+
+
+# --- CÓDIGOS DE CONVITE ---
+LEGACY_CODE = re.compile(r'[0-9A-Fa-f]{8}')
+NEW_CODE = re.compile(r'[GHJKMNPQRSTVWXYZ][0-9A-HJKMNP-TV-Z]{7}')
+
+
+class InviteCodeTests(TestCase):
+    def setUp(self):
+        # Cada teste começa sem bloco reservado neste processo
+        patcher = mock.patch.object(invite_codes, '_block', iter(()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_encode_is_injective_and_never_legacy(self):
+        values = list(range(200_000)) + list(range(invite_codes.SPACE - 50_000, invite_codes.SPACE))
+        started = time.perf_counter()
+        codes = [invite_codes.encode(value) for value in values]
+        elapsed = time.perf_counter() - started
+        self.assertEqual(len(set(codes)), len(values))
+        for code in codes:
+            self.assertTrue(NEW_CODE.fullmatch(code), code)
+            self.assertFalse(LEGACY_CODE.fullmatch(code), code)
+        # Folga larga em relação aos ~390k/s medidos: só apanha regressões grosseiras
+        self.assertGreater(len(values) / elapsed, 50_000)
+
+    def test_bulk_create_assigns_distinct_codes_with_one_reservation(self):
+        single = make_user()
+        with CaptureQueriesContext(connection) as captured:
+            CustomUser.objects.bulk_create([CustomUser(phone_number=f'94{i:07d}') for i in range(500)])
+        sequence_updates = [q for q in captured.captured_queries if q['sql'].startswith('UPDATE "core_invitecodesequence"')]
+        self.assertEqual(len(sequence_updates), 1)
+        codes = list(CustomUser.objects.values_list('invite_code', flat=True))
+        self.assertEqual(len(codes), 501)
+        self.assertEqual(len(set(codes)), 501)
+        self.assertIn(single.invite_code, codes)
+
+    def test_block_reserved_in_rolled_back_transaction_is_not_used(self):
+        class Rollback(Exception):
+            pass
+
+        with self.assertRaises(Rollback), transaction.atomic():
+            discarded = make_user().invite_code
+            raise Rollback
+        # A reserva foi desfeita com a transação, por isso o bloco não pode ficar neste processo
+        self.assertIsNone(next(invite_codes._block, None))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first = make_user().invite_code
+        second = make_user().invite_code
+        # O número devolvido à sequência volta a ser reservado, agora uma única vez
+        self.assertEqual(first, discarded)
+        self.assertNotEqual(second, first)
+        self.assertEqual(CustomUser.objects.filter(invite_code=first).count(), 1)
+
+
+# --- NOMES DOS UPLOADS ---
+class UploadNameTests(TestCase):
+    def test_camera_filenames_never_share_a_url(self):
+        field = Deposit._meta.get_field('proof_of_payment')
+        names = {field.generate_filename(None, 'IMG_0001.JPG') for _ in range(100)}
+        self.assertEqual(len(names), 100)
+        for name in names:
+            self.assertTrue(name.startswith('deposit_proofs/'), name)
+            self.assertTrue(name.endswith('.jpg'), name)
+            self.assertNotIn('IMG_0001', name)
+
+
+# --- APROVAÇÃO DE DEPÓSITOS ---
+class ApproveDepositsTests(TestCase):
+    def make_deposit(self, user, amount='5000', **kwargs):
+        return Deposit.objects.create(
+            user=user, amount=Decimal(amount), payment_method='bank', proof_of_payment='deposit_proofs/teste.jpg', **kwargs
+        )
+
+    def test_approving_twice_credits_once(self):
+        user = make_user()
+        deposit = self.make_deposit(user)
+        self.assertEqual(deposits.approve_deposits([deposit.pk]), (1, Decimal('5000')))
+        self.assertEqual(deposits.approve_deposits([deposit.pk, deposit.pk]), (0, Decimal('0')))
+        user.refresh_from_db()
+        self.assertEqual(user.available_balance, Decimal('5000'))
+        self.assertEqual(LedgerEntry.objects.filter(user=user, kind=LedgerEntry.DEPOSITO).count(), 1)
+        self.assertEqual(BalanceSummary.objects.get(pk=user.pk).deposits_total, Decimal('5000'))
+
+    def test_chunked_approval_credits_every_user(self):
+        users = [make_user() for _ in range(5)]
+        # Dois depósitos por utilizador, em blocos de 3 que cortam a meio os pares
+        ids = [self.make_deposit(user, amount=str(1000 * (index + 1))).pk for index, user in enumerate(users * 2)]
+        approved, total = deposits.approve_deposits(ids, chunk_size=3)
+        self.assertEqual(approved, 10)
+        self.assertEqual(total, sum(Decimal(1000 * (index + 1)) for index in range(10)))
+        for index, user in enumerate(users):
+            with self.subTest(user=user.pk):
+                user.refresh_from_db()
+                expected = Decimal(1000 * (index + 1) + 1000 * (index + 6))
+                self.assertEqual(user.available_balance, expected)
+                self.assertEqual(BalanceSummary.objects.get(pk=user.pk).deposits_total, expected)
+        self.assertFalse(Deposit.objects.filter(pk__in=ids, is_approved=False).exists())
+
+    def test_already_approved_ids_are_skipped(self):
+        user = make_user()
+        done = self.make_deposit(user, amount='3000', is_approved=True)
+        pending = [self.make_deposit(user).pk for _ in range(3)]
+        approved, total = deposits.approve_deposits([done.pk, *pending], chunk_size=2)
+        self.assertEqual((approved, total), (3, Decimal('15000')))
+        user.refresh_from_db()
+        self.assertEqual(user.available_balance, Decimal('15000'))
+        self.assertEqual(
+            sorted(LedgerEntry.objects.filter(user=user).values_list('note', flat=True)),
+            sorted(f'Depósito #{pk}' for pk in pending),
+        )
+
+
+class ApproveDepositViewTests(TestCase):
+    def test_concurrent_approval_is_reported_not_500(self):
+        staff = make_user(is_staff=True)
+        deposit = Deposit.objects.create(
+            user=make_user(), amount=Decimal('5000'), payment_method='bank', proof_of_payment='deposit_proofs/teste.jpg',
+        )
+        request = RequestFactory().get('/')
+        request.user = staff
+        request._messages = CookieStorage(request)
+        error = deposits.ConcurrentApprovalError('Depósitos aprovados em simultâneo por outro processo; repita a operação.')
+        with mock.patch.object(views, 'approve_deposits', side_effect=error):
+            response = views.approve_deposit(request, deposit.pk)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual([str(message) for message in get_messages(request)], [str(error)])
+
+
+# --- EXTRATO E CONTADORES DE SALDO ---
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+
+    def summary(self, user):
+        return BalanceSummary.objects.filter(pk=user.pk).values(
+            'deposits_total', 'withdrawals_total', 'task_income_total', 'subsidy_total',
+        ).first()
+
+    def test_debit_refuses_uncovered_withdrawal(self):
+        ledger.post([(self.user.pk, LedgerEntry.DEPOSITO, Decimal('1000'))])
+        self.assertFalse(ledger.debit(self.user.pk, LedgerEntry.SAQUE, Decimal('1000.01')))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.available_balance, Decimal('1000'))
+        self.assertFalse(LedgerEntry.objects.filter(user=self.user, kind=LedgerEntry.SAQUE).exists())
+
+    def test_debit_covered_withdrawal(self):
+        ledger.post([(self.user.pk, LedgerEntry.DEPOSITO, Decimal('1000'))])
+        self.assertTrue(ledger.debit(self.user.pk, LedgerEntry.SAQUE, Decimal('1000'), 'Saque'))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.available_balance, Decimal('0'))
+        self.assertEqual(
+            list(LedgerEntry.objects.filter(user=self.user, kind=LedgerEntry.SAQUE).values_list('amount', 'note')),
+            [(Decimal('-1000'), 'Saque')],
+        )
+
+    def test_post_credits_balance_and_summary(self):
+        other = make_user()
+        ledger.post([
+            (self.user.pk, LedgerEntry.DEPOSITO, Decimal('5000')),
+            (self.user.pk, LedgerEntry.TAREFA, Decimal('250')),
+            (other.pk, LedgerEntry.ROLETA, Decimal('500')),
+            (other.pk, LedgerEntry.TAREFA, Decimal('250')),
+        ])
+        self.user.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.user.available_balance, self.user.subsidy_balance), (Decimal('5250'), Decimal('0')))
+        self.assertEqual((other.available_balance, other.subsidy_balance), (Decimal('750'), Decimal('500')))
+        self.assertEqual(self.summary(self.user), {
+            'deposits_total': Decimal('5000'), 'withdrawals_total': Decimal('0'),
+            'task_income_total': Decimal('250'), 'subsidy_total': Decimal('0'),
+        })
+        self.assertEqual(self.summary(other), {
+            'deposits_total': Decimal('0'), 'withdrawals_total': Decimal('0'),
+            'task_income_total': Decimal('250'), 'subsidy_total': Decimal('500'),
+        })
+
+    def test_post_rolls_back_everything_on_failure(self):
+        increment = ledger._bulk_increment
+
+        def fail_on_summary(model, deltas):
+            if model is BalanceSummary:
+                raise RuntimeError('falha simulada')
+            return increment(model, deltas)
+
+        with mock.patch.object(ledger, '_bulk_increment', side_effect=fail_on_summary):
+            with self.assertRaises(RuntimeError):
+                ledger.post([(self.user.pk, LedgerEntry.DEPOSITO, Decimal('5000'))])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.available_balance, Decimal('0'))
+        self.assertFalse(LedgerEntry.objects.filter(user=self.user).exists())
+        self.assertIsNone(self.summary(self.user))
+
+    def test_rebuild_matches_live_counters(self):
+        users = [self.user, make_user(), make_user()]
+        for index, user in enumerate(users):
+            deposit = Deposit.objects.create(
+                user=user, amount=Decimal('5000') * (index + 1), payment_method='bank',
+                proof_of_payment='deposit_proofs/teste.jpg',
+            )
+            deposits.approve_deposits([deposit.pk])
+            Deposit.objects.create(
+                user=user, amount=Decimal('777'), payment_method='bank', proof_of_payment='deposit_proofs/teste.jpg',
+            )
+            Task.objects.create(user=user, earnings=Decimal('250'))
+            ledger.post([
+                (user.pk, LedgerEntry.TAREFA, Decimal('250')),
+                (user.pk, LedgerEntry.ROLETA, Decimal('100') * index),
+            ])
+            withdrawal = Withdrawal.objects.create(user=user, amount=Decimal('1000'), method='BANCO', status='Aprovado')
+            ledger.adjust_summary(user.pk, withdrawals_total=withdrawal.amount)
+        # Sem movimentos: o contador é criado pela reconstrução, a zeros
+        users.append(make_user())
+
+        live = {user.pk: self.summary(user) for user in users}
+        self.assertEqual(ledger.rebuild_summaries(chunk_size=2), len(users))
+        zeros = dict.fromkeys(('deposits_total', 'withdrawals_total', 'task_income_total', 'subsidy_total'), Decimal('0'))
+        for user in users:
+            with self.subTest(user=user.pk):
+                self.assertEqual(self.summary(user), live[user.pk] or zeros)
+
+
+@test_settings
+class BalanceSummaryAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser(str(next(_phones)), 'senha-teste')
+        cls.user = make_user()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def totals(self):
+        summary = BalanceSummary.objects.filter(pk=self.user.pk).first()
+        return (summary.deposits_total, summary.withdrawals_total) if summary else (Decimal('0'), Decimal('0'))
+
+    def change(self, obj, **data):
+        url = reverse(f'admin:core_{obj._meta.model_name}_change', args=[obj.pk])
+        response = self.client.post(url, data, secure=True)
+        self.assertEqual(response.status_code, 302, getattr(response, 'context_data', {}).get('errors'))
+
+    def deposit_form(self, deposit, is_approved):
+        data = dict(user=deposit.user_id, amount=deposit.amount, payment_method=deposit.payment_method, payer_name='')
+        if is_approved:
+            data['is_approved'] = 'on'
+        return data
+
+    def test_deposit_approval_toggle_moves_deposits_total(self):
+        deposit = Deposit.objects.create(
+            user=self.user, amount=Decimal('5000'), payment_method='bank', proof_of_payment='deposit_proofs/teste.jpg',
+        )
+        self.change(deposit, **self.deposit_form(deposit, is_approved=True))
+        self.assertEqual(self.totals(), (Decimal('5000'), Decimal('0')))
+        # Gravar sem mudar a aprovação não volta a contar
+        self.change(deposit, **dict(self.deposit_form(deposit, is_approved=True), payer_name='Outro'))
+        self.assertEqual(self.totals(), (Decimal('5000'), Decimal('0')))
+        self.change(deposit, **self.deposit_form(deposit, is_approved=False))
+        self.assertEqual(self.totals(), (Decimal('0'), Decimal('0')))
+
+    def test_withdrawal_status_moves_withdrawals_total(self):
+        withdrawal = Withdrawal.objects.create(user=self.user, amount=Decimal('1000'), method='BANCO')
+        form = dict(user=self.user.pk, amount=withdrawal.amount, method='BANCO', withdrawal_details='')
+        steps = [
+            ('Recusado', Decimal('0')),
+            ('Aprovado', Decimal('1000')),
+            ('Aprovado', Decimal('1000')),
+            ('Pendente', Decimal('0')),
+            ('Aprovado', Decimal('1000')),
+        ]
+        for status, expected in steps:
+            with self.subTest(status=status):
+                self.change(withdrawal, status=status, **form)
+                self.assertEqual(self.totals(), (Decimal('0'), expected))
+
+
+# --- FILA DE JOBS ---
+def job_ok(**payload):
+    pass
+
+
+def job_fails(**payload):
+    raise RuntimeError('falha temporária')
+
+
+def job_invalid(**payload):
+    raise jobs.PermanentJobError('nunca vai funcionar')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(jobs.HANDLERS, {
+            'ok': 'core.tests.job_ok', 'fails': 'core.tests.job_fails', 'invalid': 'core.tests.job_invalid',
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_claim_takes_ready_jobs_once(self):
+        first, second = jobs.enqueue('ok', n=1), jobs.enqueue('ok', n=2)
+        later = jobs.enqueue('ok', n=3)
+        Job.objects.filter(pk=later.pk).update(run_after=timezone.now() + timedelta(minutes=5))
+
+        self.assertEqual([job.pk for job in jobs.claim(1)], [first.pk])
+        self.assertEqual([job.pk for job in jobs.claim(10)], [second.pk])
+        self.assertEqual(jobs.claim(10), [])
+        self.assertEqual(Job.objects.get(pk=first.pk).status, Job.EM_CURSO)
+        self.assertEqual(Job.objects.get(pk=later.pk).status, Job.PENDENTE)
+
+    def test_stale_jobs_are_reclaimed(self):
+        stale, busy = jobs.enqueue('ok'), jobs.enqueue('ok')
+        now = timezone.now()
+        Job.objects.filter(pk=stale.pk).update(status=Job.EM_CURSO, locked_at=now - jobs.STALE_AFTER - timedelta(seconds=1))
+        Job.objects.filter(pk=busy.pk).update(status=Job.EM_CURSO, locked_at=now)
+        self.assertEqual([job.pk for job in jobs.claim(10)], [stale.pk])
+
+    def test_run_pending_completes_jobs(self):
+        job = jobs.enqueue('ok')
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_at), (Job.CONCLUIDO, 1, None))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failures_back_off_then_give_up(self):
+        job = jobs.enqueue('fails')
+        Job.objects.filter(pk=job.pk).update(max_attempts=3)
+        for attempt, delay in ((1, 30), (2, 60)):
+            with self.subTest(attempt=attempt), self.assertLogs('core.jobs', 'WARNING'):
+                Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+                before = timezone.now()
+                self.assertEqual(jobs.run_pending(), (1, 1))
+                job.refresh_from_db()
+                self.assertEqual((job.status, job.attempts), (Job.PENDENTE, attempt))
+                self.assertAlmostEqual(job.run_after, before + timedelta(seconds=delay), delta=timedelta(seconds=5))
+                self.assertIn('falha temporária', job.last_error)
+                # Em espera: ainda não volta a ser reclamado
+                self.assertEqual(jobs.claim(10), [])
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FALHOU, 3))
+
+    def test_permanent_error_fails_at_once(self):
+        job = jobs.enqueue('invalid')
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertEqual(jobs.run_pending(), (1, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FALHOU, 1))
+
+    def test_unknown_kind_is_rejected(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue('desconhecido')
+
+
+# --- COMPROVATIVOS DE DEPÓSITO ---
+def image_bytes(size, fmt, mode='RGB', color='red', **save_kwargs):
+    buffer = BytesIO()
+    Image.new(mode, size, color).save(buffer, fmt, **save_kwargs)
+    return buffer.getvalue()
+
+
+class DepositProofTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp(prefix='proofs_')
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = make_user()
+
+    def deposit(self, data, name):
+        return Deposit.objects.create(
+            user=self.user, amount=Decimal('5000'), payment_method='bank', proof_of_payment=ContentFile(data, name=name),
+        )
+
+    def processed(self, deposit):
+        proofs.process_deposit_proof(deposit.pk)
+        deposit.refresh_from_db()
+        with deposit.proof_of_payment.open('rb') as fh:
+            original = Image.open(BytesIO(fh.read()))
+        with deposit.proof_thumbnail.open('rb') as fh:
+            thumbnail = Image.open(BytesIO(fh.read()))
+        return deposit, original, thumbnail
+
+    def test_reencodes_resizes_and_deletes_old_file(self):
+        deposit = self.deposit(image_bytes((3000, 1500), 'PNG', mode='RGBA', color=(0, 0, 0, 0)), 'IMG_0001.PNG')
+        old_name = deposit.proof_of_payment.name
+        deposit, original, thumbnail = self.processed(deposit)
+
+        self.assertEqual(original.format, 'JPEG')
+        self.assertEqual(original.size, (proofs.MAX_DIMENSION, proofs.MAX_DIMENSION // 2))
+        # Zonas transparentes passam a branco, não a preto
+        self.assertTrue(all(channel > 250 for channel in original.getpixel((10, 10))))
+        self.assertEqual(thumbnail.format, 'JPEG')
+        self.assertEqual(thumbnail.size, (proofs.THUMBNAIL_DIMENSION, proofs.THUMBNAIL_DIMENSION // 2))
+        self.assertTrue(deposit.proof_of_payment.name.endswith('.jpg'))
+        self.assertNotEqual(deposit.proof_of_payment.name, old_name)
+        self.assertFalse(deposit.proof_of_payment.storage.exists(old_name))
+
+    def test_exif_orientation_is_applied_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rodar 90°
+        exif[0x010F] = 'Telemóvel'
+        deposit, original, thumbnail = self.processed(self.deposit(image_bytes((40, 20), 'JPEG', exif=exif), 'foto.jpg'))
+        self.assertEqual(original.size, (20, 40))
+        self.assertEqual(thumbnail.size, (20, 40))
+        self.assertEqual(dict(original.getexif()), {})
+
+    def test_invalid_file_fails_permanently(self):
+        deposit = self.deposit(b'%PDF-1.4 nao e imagem', 'comprovativo.jpg')
+        with self.assertRaises(jobs.PermanentJobError):
+            proofs.process_deposit_proof(deposit.pk)
+        deposit.refresh_from_db()
+        self.assertFalse(deposit.proof_thumbnail)
+
+    def test_processed_proof_is_left_alone(self):
+        deposit, _, _ = self.processed(self.deposit(image_bytes((50, 50), 'PNG'), 'a.png'))
+        names = (deposit.proof_of_payment.name, deposit.proof_thumbnail.name)
+        proofs.process_deposit_proof(deposit.pk)
+        deposit.refresh_from_db()
+        self.assertEqual((deposit.proof_of_payment.name, deposit.proof_thumbnail.name), names)
+
+
+@test_settings
+class DepositAdminProofTests(TestCase):
+    def test_detail_page_shows_full_proof(self):
+        admin_user = CustomUser.objects.create_superuser(str(next(_phones)), 'senha-teste')
+        deposit = Deposit.objects.create(
+            user=make_user(), amount=Decimal('5000'), payment_method='bank',
+            proof_of_payment='deposit_proofs/original.jpg', proof_thumbnail='deposit_proofs/thumbs/pequena.jpg',
+        )
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:core_deposit_change', args=[deposit.pk]), secure=True)
+        self.assertContains(response, '<img src="/media/deposit_proofs/original.jpg"')
+        self.assertNotContains(response, 'thumbs/pequena.jpg')
+
+
+# --- FICHEIROS DE MEDIA ---
+@test_settings
+class MediaServeTests(TestCase):
+    CONTENT = bytes(range(50))
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp(prefix='media_')
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        for folder in ('deposit_proofs', 'level_images'):
+            os.makedirs(os.path.join(media_root, folder))
+            with open(os.path.join(media_root, folder, 'a.jpg'), 'wb') as fh:
+                fh.write(self.CONTENT)
+
+    def get(self, path='deposit_proofs/a.jpg', **headers):
+        response = self.client.get(f'/media/{path}', secure=True, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    def test_full_file_with_validators(self):
+        response, body = self.get()
+        self.assertEqual((response.status_code, body), (200, self.CONTENT))
+        self.assertEqual(response['Content-Length'], '50')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['Cache-Control'].startswith('private,'))
+        self.assertTrue(self.get('level_images/a.jpg')[0]['Cache-Control'].startswith('public,'))
+
+    def test_etag_gives_304(self):
+        etag = self.get()[0]['ETag']
+        response, body = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, body), (304, b''))
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"outro"')[0].status_code, 200)
+
+    def test_single_range(self):
+        response, body = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual((response.status_code, body), (206, self.CONTENT[10:20]))
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/50')
+        self.assertEqual(response['Content-Length'], '10')
+        response, body = self.get(HTTP_RANGE='bytes=-5')
+        self.assertEqual((response.status_code, body), (206, self.CONTENT[-5:]))
+        response, body = self.get(HTTP_RANGE='bytes=45-100')
+        self.assertEqual((response.status_code, body), (206, self.CONTENT[45:]))
+
+    def test_if_range(self):
+        etag = self.get()[0]['ETag']
+        response, body = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual((response.status_code, body), (206, self.CONTENT[:10]))
+        # Ficheiro mudou desde a primeira parte: recomeça com o ficheiro inteiro
+        response, body = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"antigo"')
+        self.assertEqual((response.status_code, body), (200, self.CONTENT))
+
+    def test_unsatisfiable_range_gives_416(self):
+        for header in ('bytes=50-', 'bytes=60-70', 'bytes=-0'):
+            with self.subTest(range=header):
+                response, _ = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */50')
+
+    def test_invalid_range_is_ignored(self):
+        for header in ('bytes=9-3', 'bytes=0-1,5-6', 'linhas=0-1'):
+            with self.subTest(range=header):
+                response, body = self.get(HTTP_RANGE=header)
+                self.assertEqual((response.status_code, body), (200, self.CONTENT))
+
+    def test_missing_and_escaping_paths_give_404(self):
+        for path in ('deposit_proofs/nada.jpg', '../settings.py', 'deposit_proofs'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path)[0].status_code, 404)
+
+    def test_nginx_offload(self):
+        with mock.patch.object(media, 'MEDIA_ACCEL', 'nginx'):
+            response, body = self.get()
+        self.assertEqual((response.status_code, body), (200, b''))
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/deposit_proofs/a.jpg')
+
+    def test_unknown_accel_backend_is_rejected(self):
+        self.assertEqual(media._accel_backend('nginx'), 'nginx')
+        self.assertEqual(media._accel_backend(''), '')
+        with self.assertRaises(ImproperlyConfigured):
+            media._accel_backend('apache')
+
+
+# --- EXPORTAÇÃO CSV ---
+@test_settings
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        BankDetails.objects.create(user=cls.user, bank_name='BAI', IBAN='AO06 0040', account_holder_name='=HYPERLINK("x")')
+        cls.pending_deposit = Deposit.objects.create(
+            user=cls.user, amount=Decimal('5000'), payment_method='bank', payer_name='@SUM(A1)',
+            proof_of_payment='deposit_proofs/teste.jpg',
+        )
+        Deposit.objects.create(
+            user=cls.user, amount=Decimal('7000'), payment_method='bank', is_approved=True,
+            proof_of_payment='deposit_proofs/teste.jpg',
+        )
+        cls.pending_withdrawal = Withdrawal.objects.create(
+            user=cls.user, amount=Decimal('2000'), method='BANCO', withdrawal_details='+244 923',
+        )
+        Withdrawal.objects.create(user=cls.user, amount=Decimal('3000'), method='BANCO', status='Aprovado')
+
+    def parse(self, text):
+        return list(csv.reader(StringIO(text)))
+
+    def test_formula_prefixes_are_escaped(self):
+        for value in ('=1+1', '+244', '-2', '@SUM(A1)', '\tTAB', '\rCR'):
+            with self.subTest(value=value):
+                self.assertEqual(exports._cell(value), "'" + value)
+        self.assertEqual(exports._cell('Maria'), 'Maria')
+        # Números continuam números, mesmo negativos
+        self.assertEqual(exports._cell(Decimal('-5')), '-5.00')
+        self.assertEqual((exports._cell(None), exports._cell(True)), ('', 'Sim'))
+
+    def test_pending_deposit_export(self):
+        response = exports.csv_response(
+            'depositos.csv', exports.deposit_rows(Deposit.objects.filter(is_approved=False)),
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="depositos.csv"')
+        text = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(text.startswith('\ufeff'))
+        header, *rows = self.parse(text[1:])
+        self.assertEqual(header, [
+            'ID', 'Data', 'Telefone', 'Valor', 'Aprovado', 'Método', 'Pagador', 'Banco', 'IBAN', 'Titular',
+        ])
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][0], str(self.pending_deposit.pk))
+        self.assertEqual(rows[0][2:], [
+            self.user.phone_number, '5000.00', 'Não', 'bank', "'@SUM(A1)", 'BAI', 'AO06 0040', "'=HYPERLINK(\"x\")",
+        ])
+
+    def test_admin_withdrawal_export_streams_selected_rows(self):
+        admin_user = CustomUser.objects.create_superuser(str(next(_phones)), 'senha-teste')
+        self.client.force_login(admin_user)
+        response = self.client.post(
+            reverse('admin:core_withdrawal_changelist'),
+            {'action': 'export_csv', '_selected_action': [self.pending_withdrawal.pk]}, secure=True,
+        )
+        self.assertTrue(response.streaming)
+        text = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(text.startswith('\ufeff'))
+        header, *rows = self.parse(text[1:])
+        self.assertEqual(header, [
+            'ID', 'Data', 'Telefone', 'Valor', 'Estado', 'Método', 'Detalhes do pedido', 'Banco', 'IBAN', 'Titular',
+        ])
+        self.assertEqual(rows, [[
+            str(self.pending_withdrawal.pk), rows[0][1], self.user.phone_number, '2000.00', 'Pendente', 'BANCO',
+            "'+244 923", 'BAI', 'AO06 0040', "'=HYPERLINK(\"x\")",
+        ]])
+
+    def test_export_payouts_command(self):
+        out = StringIO()
+        call_command('export_payouts', 'saques', stdout=out)
+        header, *rows = self.parse(out.getvalue())
+        self.assertEqual(header[:5], ['ID', 'Data', 'Telefone', 'Valor', 'Estado'])
+        self.assertEqual([row[0] for row in rows], [str(self.pending_withdrawal.pk)])
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'depositos.csv')
+            call_command('export_payouts', 'depositos', '--all', '--output', path, stdout=StringIO())
+            with open(path, 'rb') as fh:
+                data = fh.read()
+        self.assertTrue(data.startswith('\ufeff'.encode('utf-8')))
+        header, *rows = self.parse(data.decode('utf-8-sig'))
+        self.assertEqual(header[4], 'Aprovado')
+        self.assertEqual([row[4] for row in rows], ['Não', 'Sim'])
+
+
+# --- HISTÓRICO DE SAQUES (PAGINAÇÃO POR CURSOR) ---
+@test_settings
+class WithdrawalHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        other = make_user()
+        moment = timezone.now().replace(microsecond=0)
+        withdrawals = []
+        # Blocos de 7 saques com o mesmo created_at: as fronteiras das páginas caem a meio dos empates
+        for index in range(45):
+            withdrawals.append(Withdrawal(user=cls.user, amount=Decimal(1000 + index), method='BANCO'))
+            withdrawals.append(Withdrawal(user=other, amount=Decimal('1'), method='BANCO'))
+        Withdrawal.objects.bulk_create(withdrawals)
+        for index, pk in enumerate(Withdrawal.objects.filter(user=cls.user).order_by('pk').values_list('pk', flat=True)):
+            Withdrawal.objects.filter(pk=pk).update(created_at=moment - timedelta(minutes=index // 7))
+        cls.expected = list(
+            Withdrawal.objects.filter(user=cls.user).order_by('-created_at', '-id').values_list('pk', flat=True)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def fetch(self, cursor=None):
+        params = {'cursor': cursor} if cursor else {}
+        return self.client.get(reverse('withdrawal_history'), params, secure=True)
+
+    def test_keyset_pages_have_no_gaps_or_duplicates(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            rows, cursor = pagination.keyset_page(views.withdrawal_history_queryset(self.user), cursor, size=10)
+            seen += [row.pk for row in rows]
+            pages += 1
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(pages, 5)
+        self.assertEqual(len(rows), 5)
+
+    def test_exact_last_page_has_no_cursor(self):
+        rows, cursor = pagination.keyset_page(views.withdrawal_history_queryset(self.user), size=45)
+        self.assertEqual((len(rows), cursor), (45, None))
+
+    def test_view_walks_the_whole_history(self):
+        seen, cursor = [], None
+        for _ in range(10):
+            response = self.fetch(cursor)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            seen += [row['id'] for row in data['results']]
+            cursor = data['next']
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(data['results']), 45 % pagination.PAGE_SIZE)
+
+    def test_tampered_cursor_gives_400(self):
+        def b64(raw):
+            return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+        valid = self.fetch().json()['next']
+        for cursor in (
+            valid[:-3] + '###', '%%%', b64('sem-separador'), b64('ontem|5'), b64('2026-01-01T00:00:00+00:00|x'),
+            b64('2026-01-01T00:00:00|5'), b64('2026-01-01T00:00:00+00:00|99999999999999999999999'),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.fetch(cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'success': False, 'message': 'Cursor inválido.'})
+
+    def test_anonymous_user_is_redirected(self):
+        self.client.logout()
+        self.assertEqual(self.fetch().status_code, 302)
+
+
+# --- MÉTRICAS POR PEDIDO ---
+TIMED_TEMPLATES = [dict(settings.TEMPLATES[0], BACKEND='core.template_backend.TimedDjangoTemplates')]
+
+
+@test_settings
+@override_settings(REQUEST_METRICS_ENABLED=True, TEMPLATES=TIMED_TEMPLATES)
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.staff = make_user(is_staff=True)
+
+    def setUp(self):
+        self.addCleanup(middleware.histogram._samples.clear)
+
+    def test_server_timing_header(self):
+        self.client.force_login(self.user)
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            response = self.client.get(reverse('perfil'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        timing = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timing), {'db', 'tpl', 'total'})
+        self.assertRegex(timing['db'], r'^dur=[\d.]+;desc="[1-9]\d* queries"$')
+        # Com o backend medido, o render do perfil conta tempo de template
+        self.assertGreater(float(timing['tpl'].removeprefix('dur=')), 0)
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((line['view'], line['status'], line['duplicate_queries']), ('perfil', 200, 0))
+
+    def test_repeated_queries_warn_about_n_plus_one(self):
+        users = [make_user() for _ in range(middleware.DUPLICATE_THRESHOLD)]
+
+        def n_plus_one_view(request):
+            for user in users:
+                list(BankDetails.objects.filter(user_id=user.pk))
+            return HttpResponse('ok')
+
+        request = RequestFactory().get('/n-mais-um/')
+        with self.assertLogs('core.metrics', 'WARNING') as logs:
+            middleware.RequestMetricsMiddleware(n_plus_one_view)(request)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn(f'{middleware.DUPLICATE_THRESHOLD} execuções', logs.records[0].getMessage())
+        self.assertIn('core_bankdetails', logs.records[0].getMessage())
+
+    def test_metrics_endpoint_is_staff_only(self):
+        with self.assertLogs('core.metrics', 'INFO'):
+            self.assertEqual(self.client.get(reverse('request_metrics'), secure=True).status_code, 302)
+            self.client.force_login(self.user)
+            self.assertEqual(self.client.get(reverse('request_metrics'), secure=True).status_code, 302)
+
+        self.client.force_login(self.staff)
+        with self.assertLogs('core.metrics', 'INFO'):
+            self.client.get(reverse('perfil'), secure=True)
+            response = self.client.get(reverse('request_metrics'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['views']['perfil']['count'], 1)
+
+    @override_settings(REQUEST_METRICS_ENABLED=False)
+    def test_disabled_metrics(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('request_metrics'), secure=True).status_code, 404)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('perfil'), secure=True))
+
+
+# --- VIEWS ASSÍNCRONAS (TAREFA E ROLETA) ---
+@test_settings
+class AsyncEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        RouletteSettings.objects.create(prizes='500')
+        cls.user = make_user(roulette_spins=1)
+
+    def setUp(self):
+        patcher = mock.patch.object(task_engine, '_check_day', return_value=timezone.localdate())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(caches[task_status.CACHE_ALIAS].clear)
+        # Prémios da roleta definidos em setUpTestData, não os de outro teste
+        config_cache.invalidate()
+        self.addCleanup(config_cache.invalidate)
+
+    async def post(self, name, method='post'):
+        response = await getattr(self.async_client, method)(reverse(name), secure=True)
+        return response.status_code, (response.json() if response.status_code == 200 else None)
+
+    async def test_process_task_then_daily_limit(self):
+        await self.async_client.aforce_login(self.user)
+        status, data = await self.post('process_task')
+        self.assertEqual(status, 200)
+        self.assertTrue(data['success'], data)
+        self.assertIn(str(task_engine.TRAINEE_EARNINGS), data['message'])
+
+        self.assertEqual(await self.post('process_task'), (200, {'success': False, 'message': task_engine.DAILY_LIMIT_MESSAGE}))
+        self.assertEqual(await Task.objects.filter(user=self.user).acount(), 1)
+        self.assertEqual(await LedgerEntry.objects.filter(user=self.user, kind=LedgerEntry.TAREFA).acount(), 1)
+
+    async def test_spin_roulette_then_no_spins(self):
+        await self.async_client.aforce_login(self.user)
+        self.assertEqual(await self.post('spin_roulette'), (200, {'success': True, 'prize': '500', 'remaining_spins': 0}))
+        self.assertEqual(await self.post('spin_roulette'), (200, {'success': False, 'message': 'Sem giros disponíveis.'}))
+        user = await CustomUser.objects.aget(pk=self.user.pk)
+        self.assertEqual((user.roulette_spins, user.available_balance), (0, Decimal('500')))
+
+    async def test_get_is_not_allowed(self):
+        await self.async_client.aforce_login(self.user)
+        for name in ('process_task', 'spin_roulette'):
+            with self.subTest(route=name):
+                self.assertEqual((await self.post(name, method='get'))[0], 405)
+
+    async def test_anonymous_user_is_redirected_to_login(self):
+        for name in ('process_task', 'spin_roulette'):
+            with self.subTest(route=name):
+                response = await self.async_client.post(reverse(name), secure=True)
+                self.assertEqual(response.status_code, 302)
+                self.assertTrue(response.url.startswith(reverse('login')), response.url)
+        self.assertFalse(await Task.objects.aexists())
+
+    async def test_acomplete_daily_task(self):
+        level = await Level.objects.acreate(
+            name='Nível 1', deposit_value=Decimal('5000'), daily_gain=Decimal('250'),
+            monthly_gain=Decimal('7500'), cycle_days=60, image='level_images/teste.png',
+        )
+        await UserLevel.objects.acreate(user=self.user, level=level)
+        self.assertEqual(await task_engine.acomplete_daily_task(self.user), Decimal('250'))
+        with self.assertRaisesMessage(TaskError, task_engine.DAILY_LIMIT_MESSAGE):
+            await task_engine.acomplete_daily_task(self.user)
+        # Segunda chamada recusada pela marca em cache, sem nova linha
+        self.assertEqual(await Task.objects.filter(user=self.user).acount(), 1)
+
+
+# --- RESUMO DO PAINEL (MENU E RENDA) ---
+class DashboardSummaryTests(TestCase):
+    def old_totals(self, user):
+        """Os agregados que menu e renda calculavam antes de get_dashboard_summary."""
+        active_level = UserLevel.objects.filter(user=user, is_active=True).first()
+        return {
+            'approved_deposit_total': Deposit.objects.filter(user=user, is_approved=True).aggregate(Sum('amount'))['amount__sum'] or 0,
+            'daily_income': Task.objects.filter(user=user, task_day=timezone.localdate()).aggregate(Sum('earnings'))['earnings__sum'] or 0,
+            'total_withdrawals': Withdrawal.objects.filter(user=user, status='Aprovado').aggregate(Sum('amount'))['amount__sum'] or 0,
+            'total_task_earnings': Task.objects.filter(user=user).aggregate(Sum('earnings'))['earnings__sum'] or 0,
+            'active_level_name': active_level.level.name if active_level else None,
+        }
+
+    def test_totals_match_the_old_aggregates(self):
+        levels = [make_level(name=f'Nível {index}') for index in (1, 2)]
+        today = timezone.localdate()
+        users = [make_user() for _ in range(4)]
+        for index, user in enumerate(users[:3]):
+            if index:
+                UserLevel.objects.create(user=user, level=levels[index - 1])
+            deposit = Deposit.objects.create(
+                user=user, amount=Decimal('5000') * (index + 1), payment_method='bank',
+                proof_of_payment='deposit_proofs/teste.jpg',
+            )
+            deposits.approve_deposits([deposit.pk])
+            Deposit.objects.create(
+                user=user, amount=Decimal('999'), payment_method='bank', proof_of_payment='deposit_proofs/teste.jpg',
+            )
+            for offset in range(1, 6 + index):
+                Task.objects.create(user=user, earnings=Decimal('250') + index, task_day=today - timedelta(days=offset))
+            if index != 1:
+                Task.objects.create(user=user, earnings=Decimal('450'), task_day=today)
+            for status in ('Aprovado', 'Recusado', 'Pendente', 'Aprovado'):
+                Withdrawal.objects.create(user=user, amount=Decimal('1200') + index, method='BANCO', status=status)
+        # Contadores reconstruídos a partir do histórico, como depois de rebuild_balance_summaries
+        ledger.rebuild_summaries()
+
+        for user in users:
+            with self.subTest(user=user.pk):
+                summary = get_dashboard_summary(user)
+                old = self.old_totals(user)
+                self.assertEqual(summary['active_level_name'], old.pop('active_level_name'))
+                for field, value in old.items():
+                    self.assertEqual(Decimal(summary[field]), Decimal(value), field)
+
+    def test_single_query(self):
+        user = make_user()
+        with self.assertNumQueries(1):
+            get_dashboard_summary(user)
@@ -18,6 +18,7 @@ urlpatterns = [
     path('logout/', views.user_logout, name='logout'),
     path('deposito/', views.deposito, name='deposito'),
     path('saque/', views.saque, name='saque'),
+    path('saque/historico/', views.withdrawal_history, name='withdrawal_history'),
     path('tarefa/', views.tarefa, name='tarefa'),
     path('process_task/', views.process_task, name='process_task'),
     path('nivel/', views.nivel, name='nivel'),
@@ -27,6 +28,7 @@ urlpatterns = [
     path('sobre/', views.sobre, name='sobre'),
     path('perfil/', views.perfil, name='perfil'),
     path('renda/', views.renda, name='renda'),
+    path('metrics/', views.request_metrics, name='request_metrics'),
     
    # URLs para alteração de senha CORRIGIDAS
 path('change_password/', MyPasswordChangeView.as_view(), name='change_password'),
@@ -0,0 +1,79 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# --- CACHE DO UTILIZADOR AUTENTICADO ---
+# Com USER_CACHE_ENABLED, o CachedModelBackend (auth_backends.py) lê o
+# utilizador da cache em vez de fazer um SELECT por pedido. Cada utilizador
+# tem um número de versão; o objeto fica guardado sob a versão atual e
+# qualquer alteração ao utilizador (saldo, giros, plano, gravação no admin)
+# sobe a versão depois do commit, pelo que a entrada antiga deixa de ser lida.
+#
+# Só faz sentido com uma cache partilhada entre processos (Redis, Memcached,
+# ficheiros): com LocMemCache cada worker teria a sua cópia e as invalidações
+# de um não chegariam aos outros.
+
+ENABLED = getattr(settings, 'USER_CACHE_ENABLED', False)
+TIMEOUT = getattr(settings, 'USER_CACHE_TIMEOUT', 300)
+# As versões vêm de time_ns() e nunca se repetem, por isso podem expirar: uma
+# versão perdida é substituída por outra nova e os objetos antigos ficam órfãos.
+# Mais longo que TIMEOUT, para não invalidar objetos ainda válidos.
+VERSION_TIMEOUT = max(getattr(settings, 'USER_CACHE_VERSION_TIMEOUT', 60 * 60 * 24 * 7), TIMEOUT)
+CACHE_ALIAS = getattr(settings, 'USER_CACHE_ALIAS', 'default')
+# Sobe quando os campos de CustomUser mudam: objetos antigos deixam de servir
+SCHEMA_VERSION = 1
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f'user:version:{user_id}'
+
+
+def _object_key(user_id, version):
+    return f'user:{SCHEMA_VERSION}:{user_id}:{version}'
+
+
+def get_user(user_id, loader):
+    """Utilizador `user_id` da cache, ou `loader()` (guardado para os pedidos seguintes)."""
+    if not ENABLED:
+        return loader()
+    cache = _cache()
+    key = _object_key(user_id, _current_version(cache, user_id))
+    user = cache.get(key)
+    if user is None:
+        user = loader()
+        if user is not None:
+            cache.set(key, user, TIMEOUT)
+    return user
+
+
+def _current_version(cache, user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Sem versão (primeiro acesso ou chave despejada): começa numa nova,
+        # para não reaproveitar objetos guardados sob uma versão anterior
+        version = time.time_ns()
+        if not cache.add(key, version, VERSION_TIMEOUT):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump(user_ids):
+    # Versões que nunca se repetem: um contador que expirasse voltaria a 1, 2,
+    # ... e apontaria para objetos antigos ainda na cache
+    version = time.time_ns()
+    _cache().set_many({_version_key(user_id): version for user_id in user_ids}, VERSION_TIMEOUT)
+
+
+def invalidate(*user_ids):
+    """Invalida os utilizadores indicados quando a transação atual for confirmada."""
+    if not ENABLED or not user_ids:
+        return
+    ids = set(user_ids)
+    transaction.on_commit(lambda: _bump(ids))
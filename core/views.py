@@ -2,21 +2,35 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout, update_session_auth_hash
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
 from django.contrib import messages
-from django.db.models import Sum
+from django.db import transaction
+from django.core.paginator import Paginator
 from django.urls import reverse
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.views.decorators.http import require_POST
-import random
-from datetime import date, time, datetime
+from datetime import time, datetime
 from django.utils import timezone
 from decimal import Decimal
 
 from django.contrib.auth.views import PasswordChangeView
 from django.urls import reverse_lazy
 
+from . import commissions, jobs, ledger, task_status, user_cache
+from .commissions import pay_commissions
+from .config_cache import (
+    get_levels, get_platform_bank_details, get_platform_settings,
+)
+from .dashboard import get_dashboard_summary
+from .deposits import ConcurrentApprovalError, approve_deposits
 from .forms import RegisterForm, DepositForm, WithdrawalForm, BankDetailsForm
-from .models import PlatformSettings, CustomUser, Level, UserLevel, BankDetails, Deposit, Withdrawal, Task, PlatformBankDetails, Roulette, RouletteSettings
+from .middleware import histogram
+from .models import PlatformSettings, CustomUser, Level, UserLevel, BankDetails, Deposit, Withdrawal, Roulette, LedgerEntry
+from .pagination import keyset_page
+from .roulette import SpinError, aspin_for, get_sampler
+from .task_engine import TaskError, acomplete_daily_task
+from .team import MEMBERS_PER_PAGE, direct_members, get_team_stats
 
 # --- ADICIONE ESTA CLASSE LOGO ABAIXO DOS IMPORTS ---
 class MyPasswordChangeView(PasswordChangeView):
@@ -34,24 +48,20 @@ def home(request):
 @login_required
 def menu(request):
     user = request.user
-    active_level = UserLevel.objects.filter(user=user, is_active=True).first()
-    approved_deposit_total = Deposit.objects.filter(user=user, is_approved=True).aggregate(Sum('amount'))['amount__sum'] or 0
-    today = date.today()
-    daily_income = Task.objects.filter(user=user, completed_at__date=today).aggregate(Sum('earnings'))['earnings__sum'] or 0
-    total_withdrawals = Withdrawal.objects.filter(user=user, status='Aprovado').aggregate(Sum('amount'))['amount__sum'] or 0
+    summary = get_dashboard_summary(user)
 
     try:
-        platform_settings = PlatformSettings.objects.first()
+        platform_settings = get_platform_settings()
         whatsapp_link = platform_settings.whatsapp_link
     except (PlatformSettings.DoesNotExist, AttributeError):
         whatsapp_link = '#'
 
     context = {
         'user': user,
-        'active_level': active_level,
-        'approved_deposit_total': approved_deposit_total,
-        'daily_income': daily_income,
-        'total_withdrawals': total_withdrawals,
+        'active_level_name': summary['active_level_name'],
+        'approved_deposit_total': summary['approved_deposit_total'],
+        'daily_income': summary['daily_income'],
+        'total_withdrawals': summary['total_withdrawals'],
         'whatsapp_link': whatsapp_link,
     }
     return render(request, 'menu.html', context)
@@ -76,14 +86,15 @@ def cadastro(request):
                     return render(request, 'cadastro.html', {'form': form})
             
             user.save()
-            login(request, user)
+            # Com dois backends configurados, o login sem autenticar tem de indicar qual usar
+            login(request, user, backend='core.auth_backends.CachedModelBackend')
             messages.success(request, 'Cadastro realizado com sucesso!')
             return redirect('menu')
     else:
         form = RegisterForm(initial={'invited_by_code': invite_code_from_url}) if invite_code_from_url else RegisterForm()
     
     try:
-        whatsapp_link = PlatformSettings.objects.first().whatsapp_link
+        whatsapp_link = get_platform_settings().whatsapp_link
     except (PlatformSettings.DoesNotExist, AttributeError):
         whatsapp_link = '#'
     return render(request, 'cadastro.html', {'form': form, 'whatsapp_link': whatsapp_link})
@@ -98,7 +109,7 @@ def user_login(request):
     else:
         form = AuthenticationForm()
     try:
-        whatsapp_link = PlatformSettings.objects.first().whatsapp_link
+        whatsapp_link = get_platform_settings().whatsapp_link
     except (PlatformSettings.DoesNotExist, AttributeError):
         whatsapp_link = '#'
     return render(request, 'login.html', {'form': form, 'whatsapp_link': whatsapp_link})
@@ -111,11 +122,11 @@ def user_logout(request):
 # --- DEPÓSITO ---
 @login_required
 def deposito(request):
-    platform_bank_details = PlatformBankDetails.objects.all()
-    platform_settings = PlatformSettings.objects.first()
+    platform_bank_details = get_platform_bank_details()
+    platform_settings = get_platform_settings()
     deposit_instruction = platform_settings.deposit_instruction if platform_settings else 'Instruções não disponíveis.'
     
-    level_deposits = Level.objects.all().values_list('deposit_value', flat=True).distinct().order_by('deposit_value')
+    level_deposits = sorted({level.deposit_value for level in get_levels()})
     level_deposits_list = [str(d) for d in level_deposits] 
 
     if request.method == 'POST':
@@ -128,7 +139,10 @@ def deposito(request):
             deposit.user = request.user
             deposit.payment_method = payment_method
             deposit.payer_name = payer_name
-            deposit.save()
+            with transaction.atomic():
+                deposit.save()
+                # Validação, limpeza e miniatura do comprovativo ficam para o worker
+                jobs.enqueue(jobs.PROCESS_DEPOSIT_PROOF, deposit_id=deposit.pk)
             
             return render(request, 'deposito.html', {
                 'platform_bank_details': platform_bank_details,
@@ -153,13 +167,13 @@ def deposito(request):
 def approve_deposit(request, deposit_id):
     if not request.user.is_staff:
         return redirect('menu')
-    deposit = get_object_or_404(Deposit, id=deposit_id)
-    if not deposit.is_approved:
-        deposit.is_approved = True
-        deposit.save()
-        
-        deposit.user.available_balance += deposit.amount
-        deposit.user.save()
+    deposit = get_object_or_404(Deposit.objects.select_related('user'), id=deposit_id)
+    try:
+        approved, _ = approve_deposits([deposit.pk])
+    except ConcurrentApprovalError as e:
+        messages.error(request, str(e))
+        return redirect('renda')
+    if approved:
         messages.success(request, f'Depósito de {deposit.amount} aprovado para {deposit.user.phone_number}.')
     return redirect('renda')
 
@@ -167,9 +181,9 @@ def approve_deposit(request, deposit_id):
 @login_required
 def saque(request):
     MIN_WITHDRAWAL_AMOUNT = 2000
-    platform_settings = PlatformSettings.objects.first()
+    platform_settings = get_platform_settings()
     withdrawal_instruction = platform_settings.withdrawal_instruction if platform_settings else ''
-    withdrawal_records = Withdrawal.objects.filter(user=request.user).order_by('-created_at')
+    withdrawal_records, withdrawal_next_cursor = keyset_page(withdrawal_history_queryset(request.user))
     
     now = timezone.localtime(timezone.now())
     today = now.date()
@@ -182,7 +196,7 @@ def saque(request):
 
     withdrawals_today_count = Withdrawal.objects.filter(
         user=request.user, 
-        created_at__date=today, 
+        request_day=today, 
         status__in=['Pendente', 'Aprovado']
     ).count()
     can_withdraw_today = withdrawals_today_count == 0
@@ -224,25 +238,29 @@ def saque(request):
                 elif metodo == 'USDT':
                     detalhes += f"Carteira: {usdt_addr}"
 
-                Withdrawal.objects.create(
-                    user=request.user, 
-                    amount=amount_with_discount,
-                    method=metodo,
-                    withdrawal_details=detalhes,
-                    status='Pendente'
-                )
-
-                request.user.available_balance -= original_amount
-                request.user.save()
-                
-                messages.success(request, f'Pedido enviado! Taxa de 10% descontada ({taxa} KZ). Você receberá {amount_with_discount} KZ.')
-                return redirect('saque')
+                # Débito condicional e pedido na mesma transação
+                with transaction.atomic():
+                    debited = ledger.debit(request.user.pk, LedgerEntry.SAQUE, original_amount, 'Pedido de saque')
+                    if debited:
+                        Withdrawal.objects.create(
+                            user=request.user, 
+                            amount=amount_with_discount,
+                            method=metodo,
+                            withdrawal_details=detalhes,
+                            status='Pendente'
+                        )
+
+                if debited:
+                    messages.success(request, f'Pedido enviado! Taxa de 10% descontada ({taxa} KZ). Você receberá {amount_with_discount} KZ.')
+                    return redirect('saque')
+                messages.error(request, 'Saldo insuficiente para esta operação.')
     else:
         form = WithdrawalForm()
 
     context = {
         'withdrawal_instruction': withdrawal_instruction,
         'withdrawal_records': withdrawal_records,
+        'withdrawal_next_cursor': withdrawal_next_cursor,
         'form': form,
         'is_time_to_withdraw': is_time_to_withdraw,
         'is_sunday': is_sunday,
@@ -251,6 +269,31 @@ def saque(request):
     }
     return render(request, 'saque.html', context)
     
+def withdrawal_history_queryset(user):
+    return Withdrawal.objects.filter(user=user).only('id', 'amount', 'status', 'created_at')
+
+@login_required
+def withdrawal_history(request):
+    """Páginas seguintes do histórico de saques, em JSON, para o scroll infinito."""
+    try:
+        records, next_cursor = keyset_page(withdrawal_history_queryset(request.user), request.GET.get('cursor'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'results': [
+            {
+                'id': w.pk,
+                'amount': str(w.amount),
+                'status': w.status,
+                'created_at': timezone.localtime(w.created_at).isoformat(),
+            }
+            for w in records
+        ],
+        'next': next_cursor,
+    })
+
     # --- TAREFAS (LOGICA ATUALIZADA) ---
 @login_required
 def tarefa(request):
@@ -258,7 +301,7 @@ def tarefa(request):
     active_level = UserLevel.objects.filter(user=user, is_active=True).first()
     is_estagiario = active_level is None
     today = timezone.localdate()
-    tasks_completed_today = Task.objects.filter(user=user, completed_at__date=today).count()
+    tasks_completed_today = task_status.completed_count(user.pk, today)
     
     # Validação de Domingo para o template
     is_sunday = (today.weekday() == 6)
@@ -288,113 +331,50 @@ def tarefa(request):
     }
     return render(request, 'tarefa.html', context)
 
+# Endpoints JSON chamados em rajada pela app: assíncronos para, em ASGI,
+# não prenderem um worker inteiro enquanto esperam pela base de dados.
 @login_required
 @require_POST
-def process_task(request):
-    user = request.user
-    now = timezone.localtime(timezone.now())
-    today = now.date()
-    weekday = now.weekday()
-
-    # 1. BLOQUEIO DE DOMINGO
-    if weekday == 6:
-        return JsonResponse({'success': False, 'message': 'Hoje é feriado, volte amanhã.'})
-
-    # 2. LIMITE DIÁRIO
-    if Task.objects.filter(user=user, completed_at__date=today).exists():
-        return JsonResponse({'success': False, 'message': 'Limite diário de tarefas alcançado.'})
-
+async def process_task(request):
+    user = await request.auser()
     try:
-        active_user_level = UserLevel.objects.filter(user=user, is_active=True).select_related('level').first()
-
-        if active_user_level:
-            # Usuário com Plano Pago
-            task_earnings = Decimal(str(active_user_level.level.daily_gain))
-        else:
-            # LOGICA DE ESTAGIÁRIO
-            if user.free_days_count >= 2:
-                return JsonResponse({
-                    'success': False, 
-                    'message': 'Seu período de estagiário terminou. Adquira um plano pago para continuar.'
-                })
-            
-            task_earnings = Decimal('450.00') # Ganho de estagiário
-            user.free_days_count += 1
-
-        # Salva a tarefa e atualiza saldo
-        Task.objects.create(user=user, earnings=task_earnings, completed_at=now) 
-        user.available_balance += task_earnings
-        user.save()
-
-        # Comissões de rede (Apenas para planos pagos)
-        p1 = user.invited_by
-        if active_user_level and p1: 
-            subsidy_a = task_earnings * Decimal('0.20')
-            p1.available_balance += subsidy_a
-            p1.subsidy_balance += subsidy_a
-            p1.save()
-
-            p2 = p1.invited_by
-            if p2:
-                subsidy_b = task_earnings * Decimal('0.03')
-                p2.available_balance += subsidy_b
-                p2.subsidy_balance += subsidy_b
-                p2.save()
-
-                p3 = p2.invited_by
-                if p3:
-                    subsidy_c = task_earnings * Decimal('0.02')
-                    p3.available_balance += subsidy_c
-                    p3.subsidy_balance += subsidy_c
-                    p3.save()
-
-        return JsonResponse({
-            'success': True, 
-            'message': f'Tarefa concluída! {task_earnings} KZ adicionados ao seu saldo.'
-        })
-
+        task_earnings = await acomplete_daily_task(user)
+    except TaskError as e:
+        return JsonResponse({'success': False, 'message': str(e)})
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'Erro: {str(e)}'})
+
+    return JsonResponse({
+        'success': True, 
+        'message': f'Tarefa concluída! {task_earnings} KZ adicionados ao seu saldo.'
+    })
         
 @login_required
 def nivel(request):
     if request.method == 'POST':
         level_id = request.POST.get('level_id')
-        level_to_buy = get_object_or_404(Level, id=level_id)
-        val = level_to_buy.deposit_value
+        if not str(level_id).isdigit():
+            raise Http404('Nível não encontrado.')
 
         user_levels = UserLevel.objects.filter(user=request.user, is_active=True).values_list('level__id', flat=True)
-        if level_to_buy.id in user_levels:
+        if int(level_id) in user_levels:
             messages.error(request, 'Você já possui este nível ativo.')
             return redirect('nivel')
 
-        if request.user.available_balance >= val:
-            request.user.available_balance -= val
-            UserLevel.objects.create(user=request.user, level=level_to_buy, is_active=True)
-            request.user.level_active = True
-            request.user.save()
-
-            p1 = request.user.invited_by
-            if p1 and UserLevel.objects.filter(user=p1, is_active=True).exists():
-                com1 = val * Decimal('0.15')
-                p1.available_balance += com1
-                p1.subsidy_balance += com1
-                p1.save()
-
-                p2 = p1.invited_by
-                if p2 and UserLevel.objects.filter(user=p2, is_active=True).exists():
-                    com2 = val * Decimal('0.03')
-                    p2.available_balance += com2
-                    p2.subsidy_balance += com2
-                    p2.save()
-
-                    p3 = p2.invited_by
-                    if p3 and UserLevel.objects.filter(user=p3, is_active=True).exists():
-                        com3 = val * Decimal('0.01')
-                        p3.available_balance += com3
-                        p3.subsidy_balance += com3
-                        p3.save()
+        with transaction.atomic():
+            # O preço vem da base, não da cache de configurações: uma alteração
+            # no admin vale logo para o débito seguinte
+            level_to_buy = get_object_or_404(Level, pk=level_id)
+            val = level_to_buy.deposit_value
+            purchased = ledger.debit(request.user.pk, LedgerEntry.NIVEL, val, f'Nível {level_to_buy.name}')
+            if purchased:
+                UserLevel.objects.create(user=request.user, level=level_to_buy, is_active=True)
+                CustomUser.objects.filter(pk=request.user.pk).update(level_active=True)
+                user_cache.invalidate(request.user.pk)
+
+                pay_commissions(request.user.pk, commissions.LEVEL_PURCHASE, val)
 
+        if purchased:
             messages.success(request, f'Parabéns! Nível {level_to_buy.name} ativado com sucesso!')
         else:
             messages.error(request, 'Saldo insuficiente para ativar este nível.')
@@ -402,7 +382,7 @@ def nivel(request):
     
     active_user_levels = UserLevel.objects.filter(user=request.user, is_active=True).values_list('level__id', flat=True)
     context = {
-        'levels': Level.objects.all().order_by('deposit_value'),
+        'levels': get_levels(),
         'user_levels': active_user_levels,
     }
     return render(request, 'nivel.html', context)
@@ -411,26 +391,27 @@ def nivel(request):
 @login_required
 def equipa(request):
     user = request.user
-    level_a = CustomUser.objects.filter(invited_by=user)
-    level_b = CustomUser.objects.filter(invited_by__in=level_a)
-    level_c = CustomUser.objects.filter(invited_by__in=level_b)
+    stats = get_team_stats(user)
+    (level_a_count, level_a_investors), (level_b_count, level_b_investors), (level_c_count, level_c_investors) = (
+        stats[1], stats[2], stats[3]
+    )
+
+    paginator = Paginator(direct_members(user), MEMBERS_PER_PAGE)
+    paginator.count = level_a_count  # já calculado pela CTE, evita um COUNT(*) extra
+    level_a_page = paginator.get_page(request.GET.get('page'))
 
     context = {
-        'team_count': level_a.count() + level_b.count() + level_c.count(),
-        'total_investors': (level_a.filter(userlevel__is_active=True).distinct().count() + 
-                           level_b.filter(userlevel__is_active=True).distinct().count() + 
-                           level_c.filter(userlevel__is_active=True).distinct().count()),
+        'team_count': level_a_count + level_b_count + level_c_count,
+        'total_investors': level_a_investors + level_b_investors + level_c_investors,
         'invite_link': request.build_absolute_uri(reverse('cadastro')) + f'?invite={user.invite_code}',
         'subsidy_balance': user.subsidy_balance,
-        'level_a_count': level_a.count(),
-        'level_a_investors': level_a.filter(userlevel__is_active=True).distinct().count(),
-        'level_b_count': level_b.count(),
-        'level_b_investors': level_b.filter(userlevel__is_active=True).distinct().count(),
-        'level_c_count': level_c.count(),
-        'level_c_investors': level_c.filter(userlevel__is_active=True).distinct().count(),
-        'level_a': level_a,
-        'level_b': level_b,
-        'level_c': level_c,
+        'level_a_count': level_a_count,
+        'level_a_investors': level_a_investors,
+        'level_b_count': level_b_count,
+        'level_b_investors': level_b_investors,
+        'level_c_count': level_c_count,
+        'level_c_investors': level_c_investors,
+        'level_a': level_a_page,
     }
     return render(request, 'equipa.html', context)
 
@@ -438,56 +419,36 @@ def equipa(request):
 @login_required
 def roleta(request):
     user = request.user
-    roulette_settings = RouletteSettings.objects.first()
-    prizes_list = [p.strip() for p in roulette_settings.prizes.split(',')] if roulette_settings and roulette_settings.prizes else ['0', '500', '1000', '0', '5000', '200', '0', '10000']
-    recent_winners = Roulette.objects.filter(is_approved=True).order_by('-spin_date')[:10]
+    prizes_list = get_sampler().prizes
+    recent_winners = Roulette.objects.filter(is_approved=True).select_related('user').order_by('-spin_date')[:10]
     context = {'roulette_spins': user.roulette_spins, 'prizes_list': prizes_list, 'recent_winners': recent_winners}
     return render(request, 'roleta.html', context)
 
 @login_required
 @require_POST
-def spin_roulette(request):
-    user = request.user
-    if not user.roulette_spins or user.roulette_spins <= 0:
-        return JsonResponse({'success': False, 'message': 'Sem giros disponíveis.'})
-
-    roulette_settings = RouletteSettings.objects.first()
-    prizes_raw = [p.strip() for p in roulette_settings.prizes.split(',')] if roulette_settings and roulette_settings.prizes else ['0', '500', '1000', '0', '5000', '200', '0', '10000']
-    
-    weighted_pool = []
-    for p in prizes_raw:
-        val = Decimal(p)
-        if val == 0: weighted_pool.extend([p] * 10)
-        elif val <= 500: weighted_pool.extend([p] * 5)
-        else: weighted_pool.append(p)
-
-    winning_prize_str = random.choice(weighted_pool)
-    prize_amount = Decimal(winning_prize_str)
-    
-    user.roulette_spins -= 1
-    user.subsidy_balance += prize_amount
-    user.available_balance += prize_amount
-    user.save()
-    
-    Roulette.objects.create(user=user, prize=prize_amount, is_approved=True)
+async def spin_roulette(request):
+    user = await request.auser()
+    try:
+        winning_prize_str, remaining_spins = await aspin_for(user)
+    except SpinError as e:
+        return JsonResponse({'success': False, 'message': str(e)})
 
     return JsonResponse({
         'success': True, 
         'prize': winning_prize_str, 
-        'remaining_spins': user.roulette_spins
+        'remaining_spins': remaining_spins
     })
 
 # --- SOBRE E PERFIL ---
 @login_required
 def sobre(request):
-    platform_settings = PlatformSettings.objects.first()
+    platform_settings = get_platform_settings()
     history_text = platform_settings.history_text if platform_settings else 'Informação indisponível.'
     return render(request, 'sobre.html', {'history_text': history_text})
 
 @login_required
 def perfil(request):
     bank_details, created = BankDetails.objects.get_or_create(user=request.user)
-    withdrawal_records = Withdrawal.objects.filter(user=request.user).order_by('-created_at')
     
     if request.method == 'POST':
         if 'update_bank' in request.POST:
@@ -501,27 +462,28 @@ def perfil(request):
         'form': BankDetailsForm(instance=bank_details),
         'bank_info': bank_details,
         'user_levels': UserLevel.objects.filter(user=request.user, is_active=True),
-        'withdrawal_records': withdrawal_records,
     }
     return render(request, 'perfil.html', context)
 
+# --- MÉTRICAS (SÓ STAFF) ---
+@staff_member_required
+def request_metrics(request):
+    if not settings.REQUEST_METRICS_ENABLED:
+        raise Http404('Métricas desativadas.')
+    return JsonResponse({'views': histogram.snapshot()})
+
 @login_required
 def renda(request):
     user = request.user
-    active_level = UserLevel.objects.filter(user=user, is_active=True).first()
-    approved_deposit_total = Deposit.objects.filter(user=user, is_approved=True).aggregate(Sum('amount'))['amount__sum'] or 0
-    today = date.today()
-    daily_income = Task.objects.filter(user=user, completed_at__date=today).aggregate(Sum('earnings'))['earnings__sum'] or 0
-    total_withdrawals = Withdrawal.objects.filter(user=user, status='Aprovado').aggregate(Sum('amount'))['amount__sum'] or 0
-    total_income = (Task.objects.filter(user=user).aggregate(Sum('earnings'))['earnings__sum'] or 0) + user.subsidy_balance
-    
+    summary = get_dashboard_summary(user)
+    total_income = summary['total_task_earnings'] + user.subsidy_balance
+
     context = {
         'user': user,
-        'active_level': active_level,
-        'approved_deposit_total': approved_deposit_total,
-        'daily_income': daily_income,
-        'total_withdrawals': total_withdrawals,
+        'active_level_name': summary['active_level_name'],
+        'approved_deposit_total': summary['approved_deposit_total'],
+        'daily_income': summary['daily_income'],
+        'total_withdrawals': summary['total_withdrawals'],
         'total_income': total_income,
     }
-    return render(request, 'renda.html', context)
-    
\ No newline at end of file
+    return render(request, 'renda.html', context)
\ No newline at end of file
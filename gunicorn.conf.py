@@ -0,0 +1,19 @@
+import os
+
+# --- GUNICORN ---
+# SERVER_MODE=wsgi (omissão): workers síncronos clássicos.
+# SERVER_MODE=asgi: workers uvicorn; as views assíncronas (process_task,
+# spin_roulette) deixam de ocupar um worker enquanto esperam pela base.
+# PORT e WEB_CONCURRENCY são lidos diretamente pelo gunicorn.
+
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi').lower()
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'angowork.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'angowork.wsgi:application'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+accesslog = os.environ.get('GUNICORN_ACCESSLOG') or None
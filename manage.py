@@ -7,6 +7,9 @@ import sys
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'angowork.settings')
+    if sys.argv[1:2] == ['test']:
+        # Base de testes SQLite em ficheiro (ver DATABASES em settings.py)
+        os.environ.setdefault('SQLITE_FILE_TESTS', 'true')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc: